@@ -4,8 +4,10 @@ from app.api.deps import (
     CurrentUser,
 )
 from app.models.optional import Message
+from app.crud import can_read_article
 from typing import Any
 from sqlmodel import func, select
+from app.service.idf_index import idf_index
 from app.models.article import Article, ArticleUpdate, ArticlePublic, ArticlesPublic
 router = APIRouter()
 
@@ -38,9 +40,7 @@ def get_article_by_id(
     if not article:
         raise HTTPException(status_code=404,
                             detail='Такой статьи не существует')
-    if article.owner_id is None:
-        return article
-    if not current_user.is_superuser and (article.owner_id != current_user.id):
+    if not can_read_article(user=current_user, article=article):
         raise HTTPException(
             status_code=400,
             detail='Недостаточно привилегий'
@@ -62,6 +62,7 @@ def delete_article(
             status_code=400,
             detail='Недостаточно привилегий'
         )
+    idf_index.remove(session, [item.content])
     session.delete(item)
     session.commit()
     return Message(message='Статья была удалена')
@@ -82,6 +83,8 @@ def update_article(*,
             detail='Недостаточно привилегий'
         )
     update_dict = article_in.model_dump(exclude_unset=True)
+    if update_dict.get('content') is not None:
+        idf_index.replace(session, article.content, update_dict['content'])
     article.sqlmodel_update(update_dict)
     session.add(article)
     session.commit()
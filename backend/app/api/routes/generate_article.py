@@ -1,38 +1,42 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from app.models.avatar import Avatar
-from app.models.article import ArticleCreate, ArticlePublic
-from app.crud import create_article
-from app.core.config import settings, russian_stop_words
+from app.models.article import Article, ArticleCreate, ArticlePublic
+from app.models.job import GenerationJob, GenerationJobPublic
+from app.crud import can_read_article, create_article, create_articles
+from app.core.config import settings
 import logging
 from app.api.deps import (
     SessionDep,
-    CurrentUser
+    CurrentUser,
+    get_current_active_superuser
 )
-from typing import Any, Optional
-from pydantic import BaseModel
-from app.service.BaseGPT import BaseGPT
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from collections import Counter
+from typing import Annotated, Any, AsyncIterator, Optional, Union
+from pydantic import BaseModel, Field
+from sqlmodel import Session, select
+from app.core.db import engine
+from app.models.user import User
+import asyncio
+import json
+import uuid
+from app.service.BaseGPT import BaseGPT, ResearchMode
+from app.service.LongFormGPT import LongFormGPT
+from app.service.search_cache import search_cache
+from app.service.page_cache import page_cache
+from app.service.job_queue import job_queue
+from app.service.singleflight import SingleFlight
+from app.service.metrics import stage
 # from nltk.corpus import stopwords
-import pymorphy2
+from app.service.idf_index import idf_index
+from app.service.text_analysis import keyword_analyzer
 
 logging.basicConfig(filename='errors.log', level=logging.ERROR,
                     format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 router = APIRouter()
-# Инициализация лемматизатора для русского языка
-morph = pymorphy2.MorphAnalyzer()
+# Одинаковые одновременные запросы на генерацию выполняются один раз
+generation_flight = SingleFlight()
 
-def lemmatize_text(text):
-    """
-    Лемматизация текста: приведение каждого слова к его базовой форме.
-    :param text: str - текст для лемматизации
-    :return: str - лемматизированный текст
-    """
-    words = text.split()
-    lemmatized_words = [morph.parse(word)[0].normal_form for word in words]
-    return ' '.join(lemmatized_words)
 # Определение модели ответа
 class ActiveModelsResponse(BaseModel):
     models: list[str]
@@ -41,14 +45,37 @@ class ActiveModelsResponse(BaseModel):
 def get_active_models() -> ActiveModelsResponse:
     return {'models': list(settings.ACTIVE_MODELS)}
 
-@router.get('/generate', response_model=Optional[ArticlePublic])
-async def generate(
-    avatar_id: str, model: str,
-    theme: str, key_words: str,
-    cur_user: CurrentUser, session: SessionDep,
-    len_article: int = 4096, goal: Optional[str] = None 
-) -> Any:
-    is_global_role = True if goal else False
+class CacheStatsResponse(BaseModel):
+    hits: int
+    misses: int
+    size: int
+
+class PageCacheStatsResponse(CacheStatsResponse):
+    revalidated: int
+    bytes: int
+
+class CoalescingStatsResponse(BaseModel):
+    leaders: int
+    followers: int
+    in_flight: int
+
+class PipelineStatsResponse(BaseModel):
+    search_cache: CacheStatsResponse
+    page_cache: PageCacheStatsResponse
+    coalescing: CoalescingStatsResponse
+
+@router.get('/stats', response_model=PipelineStatsResponse,
+            dependencies=[Depends(get_current_active_superuser)])
+def get_pipeline_stats() -> Any:
+    return {
+        'search_cache': search_cache.stats(),
+        'page_cache': page_cache.stats(),
+        'coalescing': generation_flight.stats(),
+    }
+
+def get_generation_avatar(session: Session, cur_user: User, avatar_id: uuid.UUID,
+                          model: str, len_article: int) -> Avatar:
+    """Проверяет параметры генерации и возвращает доступный пользователю аватар."""
     if len_article < 4096 or len_article > 120000:
         raise HTTPException(status_code=400,
                         detail='Длина статьи должна быть между 4096 и 120000 токенов')
@@ -68,19 +95,65 @@ async def generate(
     if not db_avatar.is_global and (not cur_user.is_superuser and db_avatar.owner_id != cur_user.id):
         raise HTTPException(
             status_code=403, detail='Нет доступа к этому аватару')
+    return db_avatar
 
-    # Логика для генерации статьи через YandexGPT-lite
-    gpt = BaseGPT(
+@router.get('/generate', response_model=Optional[Union[ArticlePublic, GenerationJobPublic]])
+async def generate(
+    avatar_id: uuid.UUID, model: str,
+    theme: Annotated[str, Query(max_length=100)], key_words: str,
+    cur_user: CurrentUser, session: SessionDep,
+    len_article: int = 4096, goal: Optional[str] = None,
+    background: bool = False, long_form: bool = False, hedge: bool = False,
+    research_mode: Optional[ResearchMode] = None
+) -> Any:
+    is_global_role = True if goal else False
+    db_avatar = get_generation_avatar(session, cur_user, avatar_id, model, len_article)
+
+    # Фоновый режим: ставим задание в очередь и сразу возвращаем его id
+    if background:
+        if job_queue.workers <= 0:
+            raise HTTPException(status_code=503,
+                                detail='Фоновая генерация отключена')
+        job = GenerationJob(
+            avatar_id=db_avatar.id,
+            model=model,
+            theme=theme,
+            key_words=key_words,
+            len_article=len_article,
+            goal=goal,
+            long_form=long_form,
+            hedge=hedge,
+            research_mode=research_mode,
+            owner_id=cur_user.id
+        )
+        session.add(job)
+        session.commit()
+        session.refresh(job)
+        job_queue.submit(job.id, job.owner_id)
+        return GenerationJobPublic.model_validate(job)
+
+    # Длинные статьи генерируются по плану, разделы — параллельно
+    gpt_class = LongFormGPT if long_form else BaseGPT
+    gpt = gpt_class(
         avatar=db_avatar,
         theme=theme,
         key_words=key_words,
         len_article=len_article,
         model=model,
         goal=goal,
-        is_global_role = is_global_role
+        is_global_role = is_global_role,
+        hedge=hedge,
+        research_mode=research_mode
     )
 
-    result = await gpt.generate_article()
+    with stage('generate'):
+        if settings.GENERATION_COALESCE_ENABLED:
+            # Каждый вызывающий получает свою запись Article, но конвейер выполняется один раз
+            key = (str(db_avatar.id), model, theme, key_words, len_article, goal, long_form, hedge,
+                   gpt.research_mode)
+            result = await generation_flight.do(key, gpt.generate_article)
+        else:
+            result = await gpt.generate_article()
     if result['content']:
         generated_text = result["content"]
 
@@ -90,11 +163,14 @@ async def generate(
             name=theme  # Можно использовать тему как название статьи
         )
         # Сохраняем статью в базе данных
-        created_article = create_article(
-            session=session,  # предполагается, что сессия передана в функцию
-            article_create=article_create,
-            owner_id=cur_user.id  # использую owner_id из аватара
-        )
+        with stage('save'):
+            # Лемматизация и обновление индекса IDF — вне цикла событий
+            created_article = await asyncio.to_thread(
+                create_article,
+                session=session,  # предполагается, что сессия передана в функцию
+                article_create=article_create,
+                owner_id=cur_user.id  # использую owner_id из аватара
+            )
         # Проверьте, что все обязательные поля заполнены
         article_public = ArticlePublic.model_validate(
             {
@@ -108,6 +184,218 @@ async def generate(
         return {"status": "error", "message": "Ошибка при генерации статьи."}
 
 
+def get_user_job(session: Session, cur_user: User, job_id: uuid.UUID) -> GenerationJob:
+    """Возвращает задание генерации, если оно принадлежит пользователю."""
+    job = session.get(GenerationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404,
+                            detail='Такого задания не существует')
+    if not cur_user.is_superuser and job.owner_id != cur_user.id:
+        raise HTTPException(status_code=400,
+                            detail='Недостаточно привилегий')
+    return job
+
+@router.get('/jobs/{job_id}', response_model=GenerationJobPublic)
+def get_generation_job(
+    job_id: uuid.UUID, cur_user: CurrentUser, session: SessionDep
+) -> Any:
+    return get_user_job(session, cur_user, job_id)
+
+@router.get('/jobs/{job_id}/article', response_model=ArticlePublic)
+def get_generation_job_article(
+    job_id: uuid.UUID, cur_user: CurrentUser, session: SessionDep
+) -> Any:
+    job = get_user_job(session, cur_user, job_id)
+    if job.status == 'failed':
+        raise HTTPException(status_code=400,
+                            detail=f'Генерация завершилась ошибкой: {job.error}')
+    if job.status != 'done' or job.article_id is None:
+        raise HTTPException(status_code=409,
+                            detail='Статья ещё не готова')
+    article = session.get(Article, job.article_id)
+    if not article:
+        raise HTTPException(status_code=404,
+                            detail='Такой статьи не существует')
+    return article
+
+
+
+class BatchItem(BaseModel):
+    theme: str = Field(max_length=100)  # тема становится названием статьи
+    key_words: str
+
+class BatchGenerateRequest(BaseModel):
+    avatar_id: uuid.UUID
+    model: str
+    items: list[BatchItem] = Field(min_length=1, max_length=settings.BATCH_MAX_ITEMS)
+    len_article: int = 4096
+    goal: Optional[str] = None
+    parallelism: int = Field(default=settings.BATCH_DEFAULT_PARALLELISM, ge=1,
+                             le=settings.BATCH_MAX_PARALLELISM)
+    research_mode: Optional[ResearchMode] = None
+
+class BatchItemResult(BaseModel):
+    theme: str
+    status: str  # done, failed
+    article: Optional[ArticlePublic] = None
+    error: Optional[str] = None
+
+class BatchGenerateResponse(BaseModel):
+    data: list[BatchItemResult]
+    count: int
+    failed: int
+
+@router.post('/generate/batch', response_model=BatchGenerateResponse)
+async def generate_batch(
+    request: BatchGenerateRequest,
+    cur_user: CurrentUser, session: SessionDep
+) -> Any:
+    """
+    Пакетная генерация статей по списку тем для одного аватара.
+
+    Темы обрабатываются параллельно (не более parallelism одновременно) через
+    общие кэши поиска и страниц и общие пулы HTTP-соединений; готовые статьи
+    сохраняются одной транзакцией. Ошибка одной темы не прерывает пакет.
+    """
+    db_avatar = get_generation_avatar(
+        session, cur_user, request.avatar_id, request.model, request.len_article)
+    limit = asyncio.Semaphore(request.parallelism)
+
+    async def run(item: BatchItem) -> dict:
+        gpt = BaseGPT(
+            avatar=db_avatar,
+            theme=item.theme,
+            key_words=item.key_words,
+            len_article=request.len_article,
+            model=request.model,
+            goal=request.goal,
+            is_global_role=bool(request.goal),
+            research_mode=request.research_mode
+        )
+        async with limit:
+            return await gpt.generate_article()
+
+    results = await asyncio.gather(*(run(item) for item in request.items), return_exceptions=True)
+
+    data = []
+    done = []
+    for item, result in zip(request.items, results):
+        if isinstance(result, BaseException):
+            error = getattr(result, 'detail', None) or str(result)
+            data.append(BatchItemResult(theme=item.theme, status='failed', error=error))
+        elif not result.get('content'):
+            data.append(BatchItemResult(theme=item.theme, status='failed',
+                                        error='Ошибка при генерации статьи.'))
+        else:
+            data.append(BatchItemResult(theme=item.theme, status='done'))
+            done.append((data[-1], ArticleCreate(content=result['content'], name=item.theme)))
+
+    if done:
+        created = await asyncio.to_thread(
+            create_articles,
+            session=session,
+            article_creates=[article_create for _, article_create in done],
+            owner_id=cur_user.id
+        )
+        for (item_result, _), article in zip(done, created):
+            item_result.article = ArticlePublic.model_validate(article)
+
+    failed = sum(1 for item_result in data if item_result.status == 'failed')
+    return BatchGenerateResponse(data=data, count=len(data), failed=failed)
+
+def _sse(event: str, data: Any) -> str:
+    """Форматирует событие для Server-Sent Events."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False, default=str)}\n\n"
+
+def _save_article(content: str, name: str, owner_id: uuid.UUID) -> dict:
+    """Сохраняет сгенерированную статью в отдельной сессии (после окончания стрима)."""
+    with stage('save'), Session(engine) as session:
+        created_article = create_article(
+            session=session,
+            article_create=ArticleCreate(content=content, name=name),
+            owner_id=owner_id
+        )
+        return ArticlePublic.model_validate(created_article).model_dump()
+
+async def _stream_generation(gpt: BaseGPT, theme: str, owner_id: uuid.UUID) -> AsyncIterator[str]:
+    """Транслирует стадии конвейера и фрагменты текста, по окончании сохраняет статью."""
+    queue: asyncio.Queue = asyncio.Queue()
+    chunks = []
+    failed = False
+
+    async def produce() -> None:
+        nonlocal failed
+        try:
+            async for chunk in gpt.stream_article(
+                    on_event=lambda event, data: queue.put_nowait((event, data))):
+                chunks.append(chunk)
+                queue.put_nowait(('token', {'text': chunk}))
+        except HTTPException as e:
+            failed = True
+            queue.put_nowait(('error', {'detail': e.detail}))
+        except Exception as e:
+            failed = True
+            logger.error(f'Ошибка потоковой генерации статьи: {e}')
+            queue.put_nowait(('error', {'detail': 'Ошибка при генерации статьи.'}))
+        finally:
+            queue.put_nowait(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (item := await queue.get()) is not None:
+            yield _sse(*item)
+        if failed:
+            return
+        if not chunks:
+            yield _sse('error', {'detail': 'Ошибка при генерации статьи.'})
+            return
+        article = await asyncio.to_thread(_save_article, ''.join(chunks), theme, owner_id)
+        yield _sse('done', article)
+    finally:
+        # Клиент отключился — прекращаем генерацию
+        producer.cancel()
+
+@router.get('/generate/stream')
+async def generate_stream(
+    avatar_id: uuid.UUID, model: str,
+    theme: Annotated[str, Query(max_length=100)], key_words: str,
+    cur_user: CurrentUser, session: SessionDep,
+    len_article: int = 4096, goal: Optional[str] = None,
+    long_form: bool = False, hedge: bool = False,
+    research_mode: Optional[ResearchMode] = None
+) -> StreamingResponse:
+    """
+    Потоковая генерация статьи через Server-Sent Events.
+
+    События: stage (searching, fetching с done/total, outline, generating),
+    token (очередной фрагмент текста), done (сохранённая статья), error.
+    В режиме long_form фрагментами отдаются готовые разделы статьи,
+    а стадия generating сообщает число готовых разделов (done/total).
+    С hedge=true запрос дублируется в запасную модель из ACTIVE_MODELS,
+    если выбранная модель не ответила первым токеном вовремя.
+    research_mode=fast строит контекст только по заголовкам и сниппетам
+    выдачи без загрузки страниц, adaptive загружает страницы, лишь если
+    сниппетов мало для статьи заданной длины (fetching тогда не приходит).
+    """
+    db_avatar = get_generation_avatar(session, cur_user, avatar_id, model, len_article)
+    gpt_class = LongFormGPT if long_form else BaseGPT
+    gpt = gpt_class(
+        avatar=db_avatar,
+        theme=theme,
+        key_words=key_words,
+        len_article=len_article,
+        model=model,
+        goal=goal,
+        is_global_role=bool(goal),
+        hedge=hedge,
+        research_mode=research_mode
+    )
+    return StreamingResponse(
+        _stream_generation(gpt, theme, cur_user.id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
 
 # Определяем модель данных для входящего запроса
 class AnalyzeTextRequest(BaseModel):
@@ -115,59 +403,99 @@ class AnalyzeTextRequest(BaseModel):
     top_n: int = 10
 
 @router.post('/analyze_text')
-def analyze_text(request: AnalyzeTextRequest):
+def analyze_text(request: AnalyzeTextRequest, session: SessionDep):
     """
     Анализирует текст: выделяет ключевые слова с помощью TF-IDF, 
     подсчитывает количество символов и слов.
     
+    IDF берётся из индекса по всем сохранённым статьям (idf_index),
+    поэтому на запрос текст только преобразуется, без обучения векторизатора.
+
     :param request: An instance of AnalyzeTextRequest containing the article text and top_n.
     :return: dict - словарь с ключевыми словами и статистикой
     """
-    
-    # Предобработка текста: удаление символов и приведение к нижнему регистру
-    clean_text = re.sub(r'\W+', ' ', request.article_text.lower())
-    
-    # Лемматизация текста (предполагается, что функция лемматизации определена)
-    lemmatized_text = lemmatize_text(clean_text)  # Замените на свою лемматизацию
+    idf_index.ensure_loaded(session)
+    return keyword_analyzer.analyze([request.article_text], request.top_n)[0]
 
-    # 1. Подсчет количества символов и слов
-    num_characters = len(request.article_text)  # Количество символов в оригинальном тексте
-    num_words = len(lemmatized_text.split())  # Количество слов
 
-    # 2. Используем TfidfVectorizer для получения весов TF-IDF для каждого слова
-    vectorizer = TfidfVectorizer(stop_words=russian_stop_words)  # Убедитесь, что стоп-слова подходят для вашего случая
-    tfidf_matrix = vectorizer.fit_transform([lemmatized_text])
-    
-    # Получаем слова и их веса
-    feature_names = vectorizer.get_feature_names_out()
-    tfidf_scores = tfidf_matrix.toarray().flatten()
-
-    # Соединяем слова с их tf-idf весами
-    word_score_pairs = list(zip(feature_names, tfidf_scores))
-
-    # Сортируем по значению TF-IDF и выбираем топ-N ключевых слов
-    sorted_words = sorted(word_score_pairs, key=lambda x: x[1], reverse=True)
-
-    # Принудительно преобразуем top_n в целое число на случай ошибок типа
-    top_n = min(max(int(request.top_n), 1), len(sorted_words))  # Ограничиваем top_n
-
-    # 3. Вычисляем общую сумму TF-IDF
-    total_tfidf = sum(score for _, score in sorted_words)
-
-    # Топ-N ключевых слов с количеством вхождений
-    top_keywords = []
-    for word, score in sorted_words[:top_n]:
-        # Преобразуем TF-IDF в количество слов
-        word_count = (score / total_tfidf) * num_words
-        top_keywords.append({"word": word, "count": round(word_count)})
-
-    # 4. Формируем итоговый результат в виде словаря
-    result = {
-        "keywords": top_keywords,
-        "statistics": {
-            "num_characters": num_characters,
-            "num_words": num_words
-        }
-    }
-    
-    return result
\ No newline at end of file
+class AnalyzeBatchRequest(BaseModel):
+    texts: list[str] = Field(default_factory=list, max_length=settings.ANALYZE_BATCH_MAX_ITEMS)
+    article_ids: list[int] = Field(default_factory=list, max_length=settings.ANALYZE_BATCH_MAX_ITEMS)
+    top_n: int = 10
+
+class AnalyzeBatchItem(BaseModel):
+    article_id: Optional[int] = None  # для текстов из texts не задан
+    keywords: list[dict] = []
+    statistics: Optional[dict] = None
+    error: Optional[str] = None
+
+class AnalyzeBatchResponse(BaseModel):
+    data: list[AnalyzeBatchItem]
+    count: int
+
+@router.post('/analyze_text/batch', response_model=AnalyzeBatchResponse)
+def analyze_text_batch(request: AnalyzeBatchRequest, cur_user: CurrentUser, session: SessionDep) -> Any:
+    """
+    Пакетный анализ: ключевые слова и статистика для многих текстов
+    и/или сохранённых статей за один вызов.
+
+    Результаты идут в порядке texts, затем article_ids. Весь пакет
+    лемматизируется одним проходом и оценивается одной разреженной
+    матрицей. Недоступная статья не прерывает пакет, а получает error.
+    """
+    if len(request.texts) + len(request.article_ids) > settings.ANALYZE_BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400,
+                            detail=f'Не больше {settings.ANALYZE_BATCH_MAX_ITEMS} текстов за раз')
+    articles = {
+        article.id: article for article in session.exec(
+            select(Article).where(Article.id.in_(request.article_ids))).all()
+    } if request.article_ids else {}
+    items = [AnalyzeBatchItem() for _ in request.texts]
+    texts = list(request.texts)
+    for article_id in request.article_ids:
+        article = articles.get(article_id)
+        if article is None or not can_read_article(user=cur_user, article=article):
+            items.append(AnalyzeBatchItem(article_id=article_id, error='Такой статьи не существует'))
+            continue
+        items.append(AnalyzeBatchItem(article_id=article_id))
+        texts.append(article.content)
+
+    idf_index.ensure_loaded(session)
+    analyzed = iter(keyword_analyzer.analyze(texts, request.top_n))
+    for item in items:
+        if item.error is None:
+            result = next(analyzed)
+            item.keywords = result['keywords']
+            item.statistics = result['statistics']
+    return AnalyzeBatchResponse(data=items, count=len(items))
+
+
+def _charset(content_type: str) -> str:
+    """Кодировка из заголовка Content-Type (по умолчанию UTF-8)."""
+    for param in content_type.split(';')[1:]:
+        name, _, value = param.partition('=')
+        if name.strip().lower() == 'charset':
+            return value.strip().strip('"')
+    return 'utf-8'
+
+@router.post('/analyze_text/upload')
+async def analyze_text_upload(request: Request, cur_user: CurrentUser, session: SessionDep, top_n: int = 10):
+    """
+    Анализ большого текста, переданного телом запроса (text/plain или файл).
+
+    Тело читается потоком и разбирается кусками, в памяти держатся только
+    счётчики словоформ. Ответ такой же, как у /analyze_text.
+    """
+    try:
+        analysis = keyword_analyzer.stream(_charset(request.headers.get('content-type', '')))
+    except LookupError:
+        raise HTTPException(status_code=400, detail='Неизвестная кодировка текста')
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > settings.ANALYZE_UPLOAD_MAX_BYTES:
+            raise HTTPException(status_code=413, detail='Слишком большой текст')
+        if chunk:
+            await asyncio.to_thread(analysis.feed, chunk)
+    await asyncio.to_thread(idf_index.ensure_loaded, session)
+    return await asyncio.to_thread(analysis.result, top_n)
@@ -56,6 +56,135 @@ class Settings(BaseSettings):
     YANDEX_API_KEY_SEARCH: str
     YANDEX_API_KEY_MODELS: str
     VSE_GPT_KEY: str
+    YANDEX_SEARCH_URL: str = "https://yandex.ru/search/xml"
+
+    # Клиент LLM (общий на процесс)
+    LLM_BASE_URL: str = "https://api.vsegpt.ru/v1"
+    LLM_CONNECT_TIMEOUT: float = 10.0
+    LLM_READ_TIMEOUT: float = 600.0
+    LLM_MAX_CONNECTIONS: int = 100
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = 20
+    LLM_KEEPALIVE_EXPIRY: float = 30.0
+
+    # Загрузка страниц-источников
+    FETCH_MAX_CONCURRENCY: int = 10
+    FETCH_MAX_PER_HOST: int = 2
+    FETCH_MAX_CONNECTIONS: int = 50
+    FETCH_URL_TIMEOUT: float = 10.0
+    FETCH_TOTAL_TIMEOUT: float = 20.0
+    FETCH_USER_AGENT: str = "Mozilla/5.0 (compatible; ContentMasters/1.0)"
+
+    # Извлечение текста из HTML (пул процессов; None — по числу ядер)
+    EXTRACT_WORKERS: int | None = None
+    EXTRACT_TIMEOUT: float = 15.0
+
+    # Кэш результатов поиска Яндекса
+    SEARCH_CACHE_TTL: int = 60 * 60 * 24
+    SEARCH_CACHE_MAX_ENTRIES: int = 10000
+
+    # Кэш извлечённого текста страниц
+    PAGE_CACHE_FRESH_TTL: int = 60 * 60
+    PAGE_CACHE_MAX_BYTES: int = 200 * 1024 * 1024
+
+    # Фоновая очередь генерации (0 воркеров — очередь отключена)
+    JOB_WORKERS: int = 4
+    JOB_MAX_ATTEMPTS: int = 3
+    JOB_RETRY_DELAY: float = 5.0
+    JOB_RUNNING_TIMEOUT: int = 60 * 30
+
+    # Упаковка контекста из источников в бюджет токенов модели
+    MODEL_CONTEXT_WINDOWS: dict[str, int] = {
+        'gpt-4o-latest': 128000,
+        'gpt-4-turbo': 128000,
+        'gpt-3.5-turbo-16k': 16385,
+    }
+    CONTEXT_DEFAULT_WINDOW: int = 16385
+    CONTEXT_MAX_TOKENS: int = 12000
+    CONTEXT_PROMPT_RESERVE: int = 1500
+    CONTEXT_CHARS_PER_TOKEN: float = 3.0
+    CONTEXT_PASSAGE_CHARS: int = 1200
+    CONTEXT_MIN_PASSAGE_WORDS: int = 8
+
+    # Источники контекста по умолчанию: full, fast (только сниппеты) или adaptive.
+    # В adaptive страницы загружаются, если сниппетов меньше RESEARCH_SNIPPET_RATIO * len_article токенов
+    RESEARCH_DEFAULT_MODE: str = 'full'
+    RESEARCH_SNIPPET_RATIO: float = 0.25
+
+    # Веер поисковых запросов: основной запрос по SEARCH_PAGES страницам выдачи, запрос по теме
+    # и по ключевым словам отдельно; выдачи объединяются по URL (reciprocal rank fusion).
+    # Выключен по умолчанию: до SEARCH_PAGES + 1 + SEARCH_MAX_KEYWORD_QUERIES платных запросов
+    # вместо одного, и загрузка страниц ждёт все выдачи вместо потокового старта
+    SEARCH_FANOUT_ENABLED: bool = False
+    SEARCH_PAGES: int = 2
+    SEARCH_MAX_KEYWORD_QUERIES: int = 3
+    SEARCH_RRF_K: int = 60
+    SEARCH_MAX_RESULTS: int = 15  # столько же, сколько в одной выдаче: число загружаемых страниц не растёт
+
+    # Удаление почти одинаковых источников (MinHash + LSH)
+    DEDUP_ENABLED: bool = True
+    DEDUP_THRESHOLD: float = 0.8
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_BANDS: int = 32
+    DEDUP_SHINGLE_SIZE: int = 5
+
+    # Кэш лемм pymorphy2 для анализа текста (число словоформ)
+    LEMMA_CACHE_SIZE: int = 200000
+    ANALYZE_BATCH_MAX_ITEMS: int = 1000  # текстов в одном пакетном анализе
+    ANALYZE_UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024  # размер текста в потоковом анализе
+    # Индекс IDF по сохранённым статьям: как часто воркер перечитывает его из базы (0 — только при старте)
+    IDF_INDEX_RELOAD_SECONDS: int = 600
+
+    # Объединение одинаковых одновременных запросов на генерацию
+    GENERATION_COALESCE_ENABLED: bool = True
+
+    # Пакетная генерация
+    BATCH_MAX_ITEMS: int = 200
+    BATCH_DEFAULT_PARALLELISM: int = 8
+    BATCH_MAX_PARALLELISM: int = 32
+
+    # Длинные статьи: план, затем параллельная генерация разделов
+    LONGFORM_SECTION_TOKENS: int = 4096
+    LONGFORM_MAX_SECTIONS: int = 12
+    LONGFORM_PARALLELISM: int = 6
+    LONGFORM_OUTLINE_TOKENS: int = 2048
+    LONGFORM_OUTLINE_CONTEXT_TOKENS: int = 6000
+    LONGFORM_SECTION_CONTEXT_TOKENS: int = 3000
+
+    # Вызовы внешних API: ограничение частоты (запросов в секунду; 0 — без ограничения),
+    # повторы при 429/5xx и предохранитель
+    YANDEX_RATE_LIMIT: float = 5.0
+    YANDEX_RATE_BURST: int = 10
+    LLM_RATE_LIMIT: float = 10.0  # на каждую модель
+    LLM_RATE_BURST: int = 20
+    UPSTREAM_MAX_ATTEMPTS: int = 4
+    UPSTREAM_RETRY_BASE: float = 0.5
+    UPSTREAM_RETRY_MAX: float = 10.0
+    UPSTREAM_MAX_QUEUE_WAIT: float = 30.0
+    UPSTREAM_BREAKER_FAILURES: int = 5
+    UPSTREAM_BREAKER_RESET: float = 30.0
+
+    # Хеджирование: если первый токен не пришёл за срок, запрос дублируется
+    # в запасную модель. Срок — квантиль времени до первого токена модели
+    # в пределах [HEDGE_MIN_DEADLINE, HEDGE_FIRST_TOKEN_DEADLINE]
+    HEDGE_FIRST_TOKEN_DEADLINE: float = 20.0
+    HEDGE_MIN_DEADLINE: float = 2.0
+    HEDGE_LATENCY_QUANTILE: float = 0.95
+    HEDGE_LATENCY_WINDOW: int = 100
+    HEDGE_MIN_SAMPLES: int = 10
+
+    # Метрики Prometheus (/metrics) и трассировка (X-Trace-Id, Server-Timing)
+    METRICS_ENABLED: bool = True
+    TRACING_ENABLED: bool = False
+    # /metrics отдаётся только с заголовком Authorization: Bearer <METRICS_TOKEN>
+    # (bearer_token в конфиге Prometheus); без токена эндпоинт закрыт
+    METRICS_TOKEN: str | None = None
+    # Счётчики кэшей с запросами к базе (размер кэша) пересчитываются не чаще раза за столько секунд
+    METRICS_STATS_TTL: float = 30.0
+
+    # Загрузка словарей pymorphy2 и newspaper3k при импорте приложения, а не при первом
+    # использовании. Для pre-fork (gunicorn.conf.py): мастер загружает их один раз,
+    # воркеры делят страницы памяти через copy-on-write
+    PRELOAD_MODELS: bool = False
     @property
     def SQLALCHEMY_DATABASE_URL(self) -> PostgresDsn:
         return MultiHostUrl.build(
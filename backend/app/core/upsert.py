@@ -0,0 +1,13 @@
+from typing import Any
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlmodel import Session
+
+
+def insert(session: Session, table: Any):
+    """
+    INSERT с поддержкой ON CONFLICT для диалекта сессии.
+
+    В работе база — PostgreSQL; SQLite поддерживается для тестов без сервера.
+    """
+    dialect = session.get_bind().dialect.name
+    return (sqlite if dialect == 'sqlite' else postgresql).insert(table)
@@ -6,6 +6,7 @@ from sqlmodel import Session, select
 from app.models.user import User, UserCreate, UserUpdate
 from app.models.article import ArticleCreate, Article
 from app.core.security import get_password_hash, verify_password
+from app.service.idf_index import idf_index
 
 
 def create_user(*, session: Session, user_create: UserCreate) -> User:
@@ -24,12 +25,31 @@ def create_article(*, session: Session, article_create: ArticleCreate, owner_id:
         article_create,
         update={'owner_id': owner_id}
     )
+    idf_index.add(session, [db_obj.content])
     session.add(db_obj)
     session.commit()
     session.refresh(db_obj)
     return db_obj
 
 
+def create_articles(*, session: Session, article_creates: list[ArticleCreate], owner_id: uuid.UUID) -> list[Article]:
+    db_objs = [
+        Article.model_validate(article_create, update={'owner_id': owner_id})
+        for article_create in article_creates
+    ]
+    idf_index.add(session, [db_obj.content for db_obj in db_objs])
+    session.add_all(db_objs)
+    session.commit()
+    for db_obj in db_objs:
+        session.refresh(db_obj)
+    return db_objs
+
+
+def can_read_article(*, user: User, article: Article) -> bool:
+    """Статья без владельца доступна всем, остальные — владельцу и суперпользователю."""
+    return article.owner_id is None or user.is_superuser or article.owner_id == user.id
+
+
 def get_user_by_email(*, session: Session, email: str) -> Optional[User]:
     statement = select(User).where(User.email == email)
     session_user = session.exec(statement).first()
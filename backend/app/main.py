@@ -1,20 +1,57 @@
+import asyncio
+from contextlib import asynccontextmanager
 from fastapi.routing import APIRoute
-from fastapi import FastAPI
+from typing import Annotated, Optional
+from fastapi import FastAPI, Header, HTTPException, Response
 from app.core.config import settings
 from starlette.middleware.cors import CORSMiddleware
+from sqlmodel import Session
 
 from app.api.main import api_router
+from app.service.llm_client import close_llm_client
+from app.service.fetcher import close_http_client
+from app.service.extractor import load_extractor, shutdown_extract_pool
+from app.service.job_queue import job_queue
+from app.service.metrics import MetricsMiddleware, metrics_authorized, metrics_payload, register_stats
+from app.service.search_cache import search_cache
+from app.service.page_cache import page_cache
+from app.service.lemmatizer import lemmatizer
+from app.service.idf_index import idf_index
+from app.service.text_analysis import keyword_analyzer
+from app.core.db import engine
+from app.api.routes.generate_article import generation_flight
+
+
+# Словари морфологии и newspaper3k иначе загружаются при первом использовании
+if settings.PRELOAD_MODELS:
+    lemmatizer.load()
+    load_extractor()
 
 
 def custom_generate_unique_id(route: APIRoute) -> str:
     return f"{route.tags[0]}-{route.name}"
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Индекс IDF и движок анализа текста готовятся один раз на воркер
+    with Session(engine) as session:
+        await asyncio.to_thread(idf_index.ensure_loaded, session)
+    await asyncio.to_thread(keyword_analyzer.prepare)
+    await job_queue.start()
+    yield
+    await job_queue.stop()
+    await close_llm_client()
+    await close_http_client()
+    shutdown_extract_pool()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     openapi_url = f"{settings.API_V1_STR}/openapi.json",
     generate_unique_id_function=custom_generate_unique_id,
-    openapi_version="3.0.0"
+    openapi_version="3.0.0",
+    lifespan=lifespan
 )
 # Set all CORS enabled origins
 if settings.BACKEND_CORS_ORIGINS:
@@ -27,4 +64,20 @@ if settings.BACKEND_CORS_ORIGINS:
         allow_methods=["*"],
         allow_headers=["*"],
     )
-app.include_router(api_router, prefix=settings.API_V1_STR)
\ No newline at end of file
+app.include_router(api_router, prefix=settings.API_V1_STR)
+
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+    # Размер кэшей поиска и страниц считается запросом к базе — не на каждом опросе
+    register_stats('search_cache', search_cache.stats, max_age=settings.METRICS_STATS_TTL)
+    register_stats('page_cache', page_cache.stats, max_age=settings.METRICS_STATS_TTL)
+    register_stats('generation_coalescing', generation_flight.stats)
+    register_stats('lemma_cache', lemmatizer.stats)
+
+    @app.get('/metrics', tags=['metrics'], include_in_schema=False)
+    def metrics(authorization: Annotated[Optional[str], Header()] = None) -> Response:
+        if not metrics_authorized(authorization):
+            raise HTTPException(status_code=401, detail='Not authenticated',
+                                headers={'WWW-Authenticate': 'Bearer'})
+        content, media_type = metrics_payload()
+        return Response(content=content, media_type=media_type)
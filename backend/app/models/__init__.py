@@ -1,4 +1,7 @@
 from .user import User
 from .avatar import Avatar
 from .article import Article
+from .cache import SearchCacheEntry, PageCacheEntry
+from .job import GenerationJob
+from .term import TermFrequency
 from sqlmodel import SQLModel
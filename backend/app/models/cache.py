@@ -0,0 +1,22 @@
+from datetime import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+
+
+class SearchCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True, max_length=64)  # sha256 от нормализованного запроса
+    query: str = Field()
+    payload: str = Field()  # JSON с результатом _parse_yandex_xml_response
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    accessed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+
+
+class PageCacheEntry(SQLModel, table=True):
+    key: str = Field(primary_key=True, max_length=64)  # sha256 от канонического URL
+    url: str = Field()
+    text: str = Field()  # извлечённый текст статьи
+    etag: Optional[str] = Field(default=None)
+    last_modified: Optional[str] = Field(default=None)
+    size: int = Field(default=0)  # объём текста в байтах
+    fetched_at: datetime = Field(default_factory=datetime.utcnow)
+    accessed_at: datetime = Field(default_factory=datetime.utcnow, index=True)
@@ -0,0 +1,37 @@
+import uuid
+from datetime import datetime
+from sqlmodel import Field, SQLModel
+from typing import Optional
+
+
+class GenerationJobBase(SQLModel):
+    avatar_id: uuid.UUID = Field(foreign_key='avatar.id')
+    model: str = Field(max_length=100)
+    theme: str = Field(max_length=100)  # становится названием статьи
+    key_words: str = Field()
+    len_article: int = Field(default=4096)
+    goal: Optional[str] = Field(default=None)
+    long_form: bool = Field(default=False)  # генерация по плану (LongFormGPT)
+    hedge: bool = Field(default=False)
+    research_mode: Optional[str] = Field(default=None, max_length=20)  # full, fast, adaptive
+
+
+class GenerationJob(GenerationJobBase, table=True):
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    owner_id: uuid.UUID = Field(foreign_key='user.id', index=True)
+    status: str = Field(default='queued', max_length=20, index=True)  # queued, running, done, failed
+    attempts: int = Field(default=0)
+    error: Optional[str] = Field(default=None)
+    article_id: Optional[int] = Field(default=None, foreign_key='article.id', nullable=True)
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
+class GenerationJobPublic(SQLModel):
+    id: uuid.UUID
+    status: str
+    attempts: int
+    error: Optional[str] = None
+    article_id: Optional[int] = None
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,6 @@
+from sqlmodel import Field, SQLModel
+
+
+class TermFrequency(SQLModel, table=True):
+    term: str = Field(primary_key=True, max_length=100)  # лемма; пустая строка — счётчик всех статей
+    documents: int = Field(default=0)  # число статей, где встречается лемма
@@ -1,15 +1,48 @@
 from app.models.avatar import Avatar
 from app.core.config import settings
-from newspaper import Article
 import xml.etree.ElementTree as ET
 import urllib.parse
 import httpx
-from openai import OpenAI
+import asyncio
+import logging
+import time
+from contextlib import aclosing
+from app.service.fetcher import FetchLimits, fetch_pages, get_http_client
+from app.service.extractor import extract_many
+from app.service.search_cache import search_cache
+from app.service.page_cache import page_cache
+from app.service.context_packer import context_budget, estimate_tokens, pack_context, split_passages
+from app.service.dedup import deduplicate
+from app.service.llm_client import get_llm_client
+from app.service.metrics import RESEARCH_SOURCES, observe_payload, record_llm_usage, stage
+from app.service.upstream import UpstreamUnavailable, is_transient_error, llm_upstream, search_upstream
+from app.service.model_router import model_router
+from app.service.search_fanout import build_queries, fuse_results
+from app.service.yandex_xml import YandexSearchError, YandexXmlParser
 from fastapi import HTTPException
-from typing import Optional
+from typing import AsyncIterator, Callable, Literal, Optional
+
+# Обработчик событий конвейера генерации: (имя события, данные)
+EventHandler = Callable[[str, dict], None]
+# Источники контекста: full — страницы целиком, fast — только сниппеты выдачи,
+# adaptive — сниппеты, а страницы загружаются, если сниппетов мало для статьи
+ResearchMode = Literal['full', 'fast', 'adaptive']
+
+logger = logging.getLogger(__name__)
+
+
+async def _cache_call(method: Callable, *args, default=None):
+    """Обращение к кэшу в потоке; ошибка кэша не прерывает генерацию."""
+    try:
+        return await asyncio.to_thread(method, *args)
+    except Exception as e:
+        logger.error(f'Ошибка кэша {method.__qualname__}: {e}')
+        return default
+
+
 class BaseGPT:
     """Общий класс для работы с текстом и API."""
-    def __init__(self, avatar: Avatar, theme: str, key_words: str, len_article: str, model: str, goal: Optional[str] = None, is_global_role = False) -> None:
+    def __init__(self, avatar: Avatar, theme: str, key_words: str, len_article: str, model: str, goal: Optional[str] = None, is_global_role = False, hedge: bool = False, research_mode: Optional[ResearchMode] = None) -> None:
         self.avatar = avatar
         self.theme = theme
         self.key_words = key_words
@@ -17,63 +50,137 @@ class BaseGPT:
         self.model = model
         self.goal = goal  # Добавляем goal как параметр
         self.is_global_role = is_global_role
+        self.hedge = hedge  # дублировать запрос в запасную модель, если основная медлит
+        self.research_mode = research_mode or settings.RESEARCH_DEFAULT_MODE
         
-    def _get_text_from_url(self, url: str) -> str:
-        """Загружает статью по URL и извлекает текст с помощью newspaper3k."""
-        try:
-            article = Article(url)
-            article.download()
-            article.parse()
-            return article.text
-        except Exception as e:
-            return ""
+    @staticmethod
+    def _emit(on_event: Optional[EventHandler], stage: str, **data) -> None:
+        """Сообщает подписчику о переходе конвейера на новую стадию."""
+        if on_event is not None:
+            on_event('stage', {'stage': stage, **data})
 
-    def _parse_yandex_xml_response(self, xml_response: str) -> dict:
-        """Парсит XML ответ от Яндекса и возвращает результаты поиска."""
-        root = ET.fromstring(xml_response)
-        groups = root.findall('.//group')
+    async def _collect_sources(self, urls: list[str], progress: Callable[[int, int], None],
+                               limits: FetchLimits) -> dict[str, str]:
+        """
+        Параллельно загружает страницы и извлекает из них текст.
 
-        search_results = []
-        for group in groups:
-            for doc in group.findall('.//doc'):
-                url = doc.find('.//url').text
-                title = doc.find('.//title').text
-                passages = [p.text for p in doc.findall('.//passage')]
-                search_results.append({
-                    "url": url,
-                    "title": title,
-                    "passages": passages
-                })
-        return {
-            "search_results": search_results
-        }
+        progress(готово, всего) получает приращения счётчиков загрузки.
+        Возвращает тексты по URL в порядке выдачи.
+        """
+        cached = await _cache_call(page_cache.get_many, urls, default={})
+        fresh = [url for url, entry in cached.items() if entry['fresh']]
+        texts = {url: cached[url]['text'] for url in fresh}
+        progress(len(fresh), len(urls))
+
+        # Устаревшие записи ревалидируем условным GET, остальные загружаем целиком
+        to_fetch = [url for url in urls if url not in texts]
+        headers = {url: page_cache.conditional_headers(cached[url])
+                   for url in to_fetch if url in cached}
+        with stage('fetch'):
+            pages = await fetch_pages(to_fetch, headers, lambda _: progress(1, 0), limits)
+
+        not_modified = [url for url, page in pages.items() if page.status == 304]
+        texts.update({url: cached[url]['text'] for url in not_modified})
+        changed = {url: page for url, page in pages.items() if page.status != 304}
+        for page in changed.values():
+            observe_payload('page', len(page.content))
+        with stage('extract'):
+            extracted = await extract_many({url: page.content for url, page in changed.items()})
+        texts.update(extracted)
+
+        await _cache_call(page_cache.touch, fresh)
+        await _cache_call(page_cache.touch, not_modified, True)
+        await _cache_call(page_cache.put_many, {
+            url: {'text': text, 'etag': changed[url].etag,
+                  'last_modified': changed[url].last_modified}
+            for url, text in extracted.items() if text
+        })
+
+        return {url: texts[url] for url in urls if texts.get(url)}
+
+    async def _search_query(self, query: str, page: int,
+                            on_results: Optional[Callable[[list], None]] = None) -> list:
+        """
+        Один запрос к Яндекс XML Search; ошибки поиска пробрасываются, ошибки кэша — нет.
 
-    async def _search_yandex(self) -> dict:
-        """Выполняет поиск через Яндекс и возвращает результаты в виде словаря."""
-        base_url = "https://yandex.ru/search/xml"
+        Ответ разбирается по мере получения: on_results получает новые
+        результаты, как только они разобраны, не дожидаясь конца ответа.
+        """
         params = {
             "folderid": settings.YANDEX_CATALOG_ID,
             "apikey": settings.YANDEX_API_KEY_SEARCH,
-            "query": f'{self.theme} + {self.key_words}',
+            "query": query,
             "l10n": "ru",
             "sortby": "rlv",
             "filter": "strict",
             "maxpassages": "2",
             "groupby": "attr=d.mode=deep.groups-on-page=5.docs-in-group=3",
-            "page": "2"
+            "page": str(page)
         }
-        url = f"{base_url}?{urllib.parse.urlencode(params)}"
+        cache_key = search_cache.make_key(params)
+        cached = await _cache_call(search_cache.get, cache_key)
+        if cached is not None:
+            if on_results is not None:
+                on_results(cached.get('search_results', []))
+            return cached.get('search_results', [])
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.get(url)
+        url = f"{settings.YANDEX_SEARCH_URL}?{urllib.parse.urlencode(params)}"
+
+        async def request() -> list:
+            parser = YandexXmlParser()
+            size = 0
+            async with get_http_client().stream('GET', url) as response:
                 response.raise_for_status()
-                return self._parse_yandex_xml_response(response.text)
-            except httpx.HTTPStatusError as e:
-                return {"error": f"Ошибка при поиске: {e}"}
+                async for data in response.aiter_bytes():
+                    size += len(data)
+                    results = parser.feed(data)
+                    if results and on_results is not None:
+                        on_results(results)
+            results = parser.close()
+            if results and on_results is not None:
+                on_results(results)
+            observe_payload('search_response', size)
+            return parser.results
 
-    def _build_prompt(self, context: list) -> list:
-        """Создаёт промпт для модели на основе информации об аватаре."""
+        results = await search_upstream.call(request)
+        if results:
+            # Пустая выдача не кэшируется: запрос повторится при следующей генерации
+            await _cache_call(search_cache.set, cache_key, query, {"search_results": results})
+        return results
+
+    async def _search_yandex(self, on_results: Optional[Callable[[list], None]] = None) -> dict:
+        """
+        Выполняет поиск через Яндекс и возвращает результаты в виде словаря.
+
+        Варианты запроса (build_queries) выполняются параллельно и
+        объединяются по URL; on_results получает объединённую выдачу.
+        Без веера единственный запрос отдаёт результаты по мере разбора.
+        """
+        if settings.SEARCH_FANOUT_ENABLED:
+            queries = build_queries(self.theme, self.key_words, settings.SEARCH_PAGES,
+                                    settings.SEARCH_MAX_KEYWORD_QUERIES)
+        else:
+            queries = [(f'{self.theme} + {self.key_words}', 0)]
+        stream_to = on_results if len(queries) == 1 else None
+        with stage('search'):
+            rankings = await asyncio.gather(
+                *(self._search_query(query, page, stream_to) for query, page in queries),
+                return_exceptions=True)
+        for ranking in rankings:
+            if isinstance(ranking, BaseException) and not isinstance(
+                    ranking, (httpx.HTTPError, ET.ParseError, YandexSearchError, UpstreamUnavailable)):
+                raise ranking
+        found = [ranking for ranking in rankings if not isinstance(ranking, BaseException)]
+        if not found:
+            # Без результатов поиска статья генерируется без источников
+            return {"error": f"Ошибка при поиске: {rankings[0]}"}
+        results = fuse_results(found, settings.SEARCH_RRF_K, settings.SEARCH_MAX_RESULTS)
+        if on_results is not None and stream_to is None:
+            on_results(results)
+        return {"search_results": results}
+
+    def _persona_message(self) -> dict:
+        """Системное сообщение с описанием аватара."""
         model_role = f'''
         Ты — {self.avatar.name}, и твоя задача — писать статьи в соответствии с твоими личными характеристиками.
         Твоя биография: {self.avatar.description}.
@@ -81,14 +188,18 @@ class BaseGPT:
         Ты эксперт в области {self.avatar.domain}, и пишешь в {self.avatar.tone} стиле.
         Твоя задача — использовать свои знания и опыт, чтобы писать информативные и увлекательные статьи.
         '''
+        return {
+            "role": "system",
+            "content": model_role
+        }
+
+    def _build_prompt(self, context: list) -> list:
+        """Создаёт промпт для модели на основе информации об аватаре."""
         # Включаем цель в промпт, если она есть
         goal_text = f"Цель создания статьи: {self.goal}. " if self.goal else ""
         
         return [
-            {
-                "role": "system",
-                "content": model_role
-            },
+            self._persona_message(),
             *context,
             {
                 "role": "system",
@@ -106,38 +217,202 @@ class BaseGPT:
             }
         ]
 
+    @staticmethod
+    def _snippet_sources(search_results: list) -> list[str]:
+        """
+        Тексты источников из заголовков и сниппетов выдачи (по одному на URL).
+
+        Заголовок и сниппеты склеиваются в один абзац: по отдельности короткие
+        строки отсеялись бы упаковщиком контекста как шум.
+        """
+        sources = {}
+        for entry in search_results:
+            passages = [passage.strip() for passage in entry.get('passages') or [] if passage.strip()]
+            if passages and entry.get('url') not in sources:
+                title = (entry.get('title') or '').strip()
+                if title and title[-1] not in '.!?…':
+                    title = f'{title}.'
+                sources[entry.get('url')] = ' '.join([title, *passages]).strip()
+        return list(sources.values())
+
+    def _snippets_sufficient(self, snippets: list[str]) -> bool:
+        """Хватает ли сниппетов для статьи запрошенной длины (считаются только фрагменты, попадающие в контекст)."""
+        tokens = sum(estimate_tokens(passage) for snippet in snippets for passage in split_passages(snippet))
+        return tokens >= self.len_article * settings.RESEARCH_SNIPPET_RATIO
+
+    async def _deduplicate(self, texts: list[str]) -> list[str]:
+        if settings.DEDUP_ENABLED:
+            with stage('dedup'):
+                texts = await asyncio.to_thread(deduplicate, texts)
+        return texts
+
+    async def _research(self, on_event: Optional[EventHandler] = None) -> list:
+        """Ищет источники в интернете и возвращает их тексты без дубликатов (кроме глобальной роли)."""
+        if self.is_global_role:
+            return []
+        self._emit(on_event, 'searching')
+        search_results = []
+        urls: dict[str, None] = {}  # в порядке выдачи
+        batches: list[asyncio.Task] = []
+        limits = FetchLimits()
+        fetched = {'done': 0, 'total': 0}
+
+        def progress(done: int, total: int) -> None:
+            fetched['done'] += done
+            fetched['total'] += total
+            self._emit(on_event, 'fetching', **fetched)
+
+        def fetch(results: list) -> None:
+            new = list(dict.fromkeys(
+                entry['url'] for entry in results if entry.get('url') and entry['url'] not in urls))
+            if new:
+                urls.update(dict.fromkeys(new))
+                batches.append(asyncio.create_task(self._collect_sources(new, progress, limits)))
+
+        def on_results(results: list) -> None:
+            search_results.extend(results)
+            if self.research_mode == 'full':
+                # Загрузка страниц начинается, не дожидаясь конца ответа поиска
+                fetch(results)
+
+        try:
+            await self._search_yandex(on_results)
+            if self.research_mode != 'full':
+                snippets = self._snippet_sources(search_results)
+                if self.research_mode == 'fast' or self._snippets_sufficient(snippets):
+                    RESEARCH_SOURCES.labels(self.research_mode, 'snippets').inc()
+                    return await self._deduplicate(snippets)
+                fetch(search_results)
+            RESEARCH_SOURCES.labels(self.research_mode, 'pages').inc()
+            collected = {}
+            for texts in await asyncio.gather(*batches):
+                collected.update(texts)
+        finally:
+            for task in batches:
+                task.cancel()
+        return await self._deduplicate([collected[url] for url in urls if url in collected])
+
+    async def _pack_context(self, sources: list, query: str, budget: int) -> list:
+        """Оставляет релевантные запросу фрагменты источников в пределах бюджета токенов."""
+        with stage('pack_context'):
+            packed = await asyncio.to_thread(pack_context, sources, query, budget)
+        return [{'role': 'system', 'content': f"{article}\n\n"} for article in packed]
+
+    async def _prepare_context(self, on_event: Optional[EventHandler] = None) -> list:
+        """Собирает контекст из найденных в интернете статей."""
+        sources = await self._research(on_event)
+        return await self._pack_context(
+            sources,
+            f'{self.theme} {self.key_words}',
+            context_budget(self.model, self.len_article),
+        )
+
+    def _completion_params(self, messages: list, max_tokens: Optional[int] = None) -> dict:
+        """Параметры запроса к модели."""
+        observe_payload('prompt', sum(len(str(m['content']).encode()) for m in messages))
+        return dict(
+            model=f"openai/{self.model}",
+            messages=messages,
+            temperature=0.7,
+            n=1,
+            max_tokens=max_tokens or self.len_article,
+            extra_headers={"X-Title": "My App"},
+        )
+
+    @staticmethod
+    def _generation_error(e: Exception) -> HTTPException:
+        """Ошибка генерации для клиента: временные сбои модели — 503 с Retry-After, остальное — 500."""
+        if is_transient_error(e):
+            retry_after = e.retry_after if isinstance(e, UpstreamUnavailable) else settings.UPSTREAM_RETRY_MAX
+            return HTTPException(status_code=503,
+                                 detail=f"Сервис генерации временно недоступен: {str(e)}",
+                                 headers={'Retry-After': str(max(1, round(retry_after)))})
+        return HTTPException(status_code=500, detail=f"Ошибка генерации статьи: {str(e)}")
+
+    async def _open_stream(self, model: str, params: dict) -> tuple:
+        """Открывает потоковый ответ модели и дожидается первого фрагмента текста."""
+        client = get_llm_client()
+        started = time.perf_counter()
+        stream = await llm_upstream.call(
+            lambda: client.chat.completions.create(**{**params, 'model': f"openai/{model}"}, stream=True),
+            key=model)
+        chunks = stream.__aiter__()
+        try:
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    model_router.record_first_token(model, time.perf_counter() - started)
+                    return stream, chunks, chunk.choices[0].delta.content
+        except BaseException:
+            await stream.close()
+            raise
+        return stream, chunks, ''
+
+    async def _stream_completion(self, messages: list, max_tokens: Optional[int] = None) -> AsyncIterator[str]:
+        """Потоковый ответ модели; в режиме hedge — от той модели, что ответила первой."""
+        params = self._completion_params(messages, max_tokens)
+        model = self.model
+        if self.hedge:
+            model, (stream, chunks, first) = await model_router.hedge(
+                self.model,
+                lambda candidate: self._open_stream(candidate, params),
+                lambda opened: opened[0].close(),
+            )
+        else:
+            stream, chunks, first = await self._open_stream(model, params)
+
+        completion = [first]
+        try:
+            if first:
+                yield first
+            async for chunk in chunks:
+                if chunk.choices and chunk.choices[0].delta.content:
+                    completion.append(chunk.choices[0].delta.content)
+                    yield chunk.choices[0].delta.content
+        finally:
+            await stream.close()
+            # Потоковый ответ приходит без usage — расход оцениваем по длине текста
+            prompt = sum(estimate_tokens(str(m['content'])) for m in messages)
+            record_llm_usage(model, prompt, estimate_tokens(''.join(completion)))
+
+    async def _complete(self, messages: list, max_tokens: Optional[int] = None) -> str:
+        """Выполняет запрос к модели и возвращает текст ответа."""
+        if self.hedge:
+            # Хеджирование опирается на время до первого токена, поэтому ответ читаем потоком
+            try:
+                with stage('llm'):
+                    return ''.join([chunk async for chunk in self._stream_completion(messages, max_tokens)])
+            except Exception as e:
+                raise self._generation_error(e) from e
+        try:
+            client = get_llm_client()
+            params = self._completion_params(messages, max_tokens)
+            with stage('llm'):
+                response_big = await llm_upstream.call(
+                    lambda: client.chat.completions.create(**params), key=self.model)
+            if response_big.usage:
+                record_llm_usage(self.model, response_big.usage.prompt_tokens,
+                                 response_big.usage.completion_tokens)
+            return response_big.choices[0].message.content
+        except Exception as e:
+            raise self._generation_error(e) from e
+
     async def generate_article(self):
         """Генерирует статью с использованием OpenAI GPT-4o."""
-        if not self.is_global_role:
-            text_from_internet = await self._search_yandex()
-            main_text = {}
-            
-            for idx, entry in enumerate(text_from_internet.get('search_results', [])):
-                url = entry.get('url')
-                if url:
-                    text = self._get_text_from_url(url)
-                    if text:
-                        main_text[f'article_{idx}'] = text  # Сохраняем полный текст статьи
-
-            context = [{'role': 'system', 'content': f"{article}\n\n"} for idx, article in main_text.items()]
-        else:
-            context = []
+        context = await self._prepare_context()
         PROMPT = self._build_prompt(context)
+        response = await self._complete(PROMPT)
+        return {'content': response}
+
+    async def stream_article(self, on_event: Optional[EventHandler] = None) -> AsyncIterator[str]:
+        """Генерирует статью потоково, отдавая фрагменты текста по мере генерации."""
+        context = await self._prepare_context(on_event)
+        PROMPT = self._build_prompt(context)
+        self._emit(on_event, 'generating')
 
         try:
-            client = OpenAI(
-                api_key=settings.VSE_GPT_KEY,
-                base_url="https://api.vsegpt.ru/v1",
-            )
-            response_big = client.chat.completions.create(
-                model=f"openai/{self.model}",
-                messages=PROMPT,
-                temperature=0.7,
-                n=1,
-                max_tokens=self.len_article,
-                extra_headers={"X-Title": "My App"},
-            )
-            response = response_big.choices[0].message.content
-            return {'content': response}
+            with stage('llm_stream'):
+                async with aclosing(self._stream_completion(PROMPT)) as chunks:
+                    async for chunk in chunks:
+                        yield chunk
         except Exception as e:
-            raise HTTPException(status_code=500, detail=f"Ошибка генерации статьи: {str(e)}")
+            raise self._generation_error(e) from e
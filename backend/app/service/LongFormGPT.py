@@ -0,0 +1,159 @@
+import asyncio
+import json
+import re
+from fastapi import HTTPException
+from typing import AsyncIterator, Optional
+from app.core.config import settings
+from app.service.BaseGPT import BaseGPT, EventHandler
+from app.service.context_packer import context_budget
+
+_OUTLINE_LINE_RE = re.compile(r'^\s*(?:#+|\d+[.)]|[-*•])\s*(.+?)\s*$')
+
+
+class LongFormGPT(BaseGPT):
+    """
+    Генерация длинных статей: сначала план, затем разделы параллельно.
+
+    Каждый раздел пишется отдельным запросом с персоной аватара и только
+    теми фрагментами источников, которые относятся к разделу. Разделы
+    собираются в порядке плана и отдаются по мере готовности.
+    """
+
+    def _sections_count(self) -> int:
+        """Число разделов исходя из запрошенной длины статьи."""
+        count = round(self.len_article / settings.LONGFORM_SECTION_TOKENS)
+        return min(max(count, 2), settings.LONGFORM_MAX_SECTIONS)
+
+    def _outline_prompt(self, context: list, sections: int) -> list:
+        """Промпт для составления плана статьи."""
+        goal_text = f"Цель создания статьи: {self.goal}. " if self.goal else ""
+        return [
+            self._persona_message(),
+            *context,
+            {
+                'role': 'user',
+                'content': f'''{goal_text}Составь план SEO-оптимизированной статьи на русском языке на тему "{self.theme}"
+                с ключевыми словами "{self.avatar.key_words}". План должен состоять ровно из {sections} разделов,
+                последний раздел — выводы и 5 часто задаваемых вопросов (FAQ).
+                Ответь только JSON без пояснений в формате:
+                {{"sections": [{{"title": "Заголовок раздела", "points": ["о чём рассказать", "..."]}}]}}'''
+            }
+        ]
+
+    @staticmethod
+    def _parse_outline(text: str) -> list[dict]:
+        """Разбирает план из ответа модели: JSON или, если не получилось, список заголовков."""
+        start, end = text.find('{'), text.rfind('}')
+        if start != -1 and end > start:
+            try:
+                sections = json.loads(text[start:end + 1]).get('sections', [])
+                outline = [
+                    {'title': str(section['title']).strip(),
+                     'points': [str(point) for point in section.get('points', [])]}
+                    for section in sections if isinstance(section, dict) and section.get('title')
+                ]
+                if outline:
+                    return outline
+            except (ValueError, AttributeError):
+                pass
+        return [
+            {'title': match.group(1), 'points': []}
+            for match in map(_OUTLINE_LINE_RE.match, text.splitlines()) if match
+        ]
+
+    def _section_prompt(self, outline: list[dict], idx: int, context: list) -> list:
+        """Промпт для отдельного раздела статьи."""
+        section = outline[idx]
+        plan = '\n'.join(f"{i + 1}. {item['title']}" for i, item in enumerate(outline))
+        points = '; '.join(section['points']) or 'раскрой заголовок раздела'
+        position = 'Это первый раздел — начни его с краткого введения в тему статьи. ' if idx == 0 else ''
+        if idx == len(outline) - 1:
+            position = 'Это последний раздел — заверши статью выводами и добавь 5 уникальных часто задаваемых вопросов (FAQ). '
+        goal_text = f"Цель создания статьи: {self.goal}. " if self.goal else ""
+        return [
+            self._persona_message(),
+            *context,
+            {
+                'role': 'user',
+                'content': f'''{goal_text}Ты пишешь SEO-оптимизированную статью на русском языке на тему "{self.theme}"
+                с ключевыми словами "{self.avatar.key_words}". План статьи:
+                {plan}
+                Напиши только раздел {idx + 1} «{section['title']}», начиная с заголовка раздела в формате Markdown (##).
+                В разделе нужно раскрыть: {points}. {position}Не повторяй содержание других разделов плана,
+                пиши своими словами, структурно и интересно.'''
+            }
+        ]
+
+    async def _generate_outline(self, sources: list) -> list[dict]:
+        """Генерирует план статьи."""
+        sections = self._sections_count()
+        context = await self._pack_context(
+            sources,
+            f'{self.theme} {self.key_words}',
+            min(context_budget(self.model, settings.LONGFORM_OUTLINE_TOKENS),
+                settings.LONGFORM_OUTLINE_CONTEXT_TOKENS),
+        )
+        response = await self._complete(
+            self._outline_prompt(context, sections), settings.LONGFORM_OUTLINE_TOKENS)
+        outline = self._parse_outline(response or '')[:settings.LONGFORM_MAX_SECTIONS]
+        if not outline:
+            raise HTTPException(status_code=500, detail='Ошибка генерации статьи: не удалось составить план')
+        return outline
+
+    async def _generate_section(self, outline: list[dict], idx: int, sources: list,
+                                limit: asyncio.Semaphore) -> str:
+        """Генерирует один раздел с контекстом, подобранным под этот раздел."""
+        section_tokens = max(self.len_article // len(outline), 1)
+        section = outline[idx]
+        context = await self._pack_context(
+            sources,
+            f"{self.theme} {section['title']} {' '.join(section['points'])}",
+            min(context_budget(self.model, section_tokens),
+                settings.LONGFORM_SECTION_CONTEXT_TOKENS),
+        )
+        async with limit:
+            return await self._complete(self._section_prompt(outline, idx, context), section_tokens)
+
+    async def _generate_sections(self, on_event: Optional[EventHandler] = None) -> AsyncIterator[str]:
+        """Генерирует разделы параллельно и отдаёт их по порядку по мере готовности."""
+        sources = await self._research(on_event)
+        self._emit(on_event, 'outline')
+        outline = await self._generate_outline(sources)
+
+        limit = asyncio.Semaphore(settings.LONGFORM_PARALLELISM)
+        tasks = [
+            asyncio.create_task(self._generate_section(outline, idx, sources, limit))
+            for idx in range(len(outline))
+        ]
+        finished = 0
+        self._emit(on_event, 'generating', done=finished, total=len(tasks))
+
+        def on_done(task: asyncio.Task) -> None:
+            nonlocal finished
+            if task.cancelled():
+                return
+            finished += 1
+            self._emit(on_event, 'generating', done=finished, total=len(tasks))
+
+        for task in tasks:
+            task.add_done_callback(on_done)
+        try:
+            for task in tasks:
+                yield (await task) or ''
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    async def generate_article(self):
+        """Генерирует длинную статью по плану."""
+        sections = [section async for section in self._generate_sections()]
+        return {'content': '\n\n'.join(section for section in sections if section)}
+
+    async def stream_article(self, on_event: Optional[EventHandler] = None) -> AsyncIterator[str]:
+        """Отдаёт готовые разделы статьи по порядку, не дожидаясь остальных."""
+        first = True
+        async for section in self._generate_sections(on_event):
+            if not section:
+                continue
+            yield section if first else f'\n\n{section}'
+            first = False
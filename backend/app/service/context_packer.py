@@ -0,0 +1,108 @@
+import math
+import re
+from collections import Counter
+from app.core.config import settings
+
+_WORD_RE = re.compile(r'\w+')
+_SENTENCE_RE = re.compile(r'(?<=[.!?…])\s+')
+
+# Параметры BM25
+_K1 = 1.5
+_B = 0.75
+
+
+def estimate_tokens(text: str) -> int:
+    """Грубая оценка числа токенов по длине текста."""
+    return math.ceil(len(text) / settings.CONTEXT_CHARS_PER_TOKEN)
+
+
+def context_budget(model: str, len_article: int) -> int:
+    """Бюджет токенов на контекст: окно модели за вычетом ответа и служебной части промпта."""
+    window = settings.MODEL_CONTEXT_WINDOWS.get(model, settings.CONTEXT_DEFAULT_WINDOW)
+    free = window - len_article - settings.CONTEXT_PROMPT_RESERVE
+    return max(0, min(free, settings.CONTEXT_MAX_TOKENS))
+
+
+def _terms(text: str) -> list[str]:
+    """Слова текста, усечённые до псевдоосновы (дешёвая замена лемматизации)."""
+    return [word[:6] for word in _WORD_RE.findall(text.lower()) if len(word) > 2]
+
+
+def _is_boilerplate(passage: str) -> bool:
+    """Отсеивает навигацию, подписи, cookie-баннеры и прочий шум."""
+    words = _WORD_RE.findall(passage)
+    if len(words) < settings.CONTEXT_MIN_PASSAGE_WORDS:
+        return True
+    letters = sum(ch.isalpha() for ch in passage)
+    return letters / len(passage) < 0.6
+
+
+def split_passages(text: str) -> list[str]:
+    """Делит текст на абзацы, длинные абзацы режет по предложениям."""
+    max_chars = settings.CONTEXT_PASSAGE_CHARS
+    passages = []
+    for paragraph in text.split('\n'):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            passages.append(paragraph)
+            continue
+        chunk = ''
+        for sentence in _SENTENCE_RE.split(paragraph):
+            if chunk and len(chunk) + len(sentence) + 1 > max_chars:
+                passages.append(chunk)
+                chunk = ''
+            chunk = f'{chunk} {sentence}' if chunk else sentence
+        if chunk:
+            passages.append(chunk)
+    return [passage for passage in passages if not _is_boilerplate(passage)]
+
+
+def pack_context(sources: list[str], query: str, budget: int) -> list[str]:
+    """
+    Отбирает самые релевантные запросу фрагменты источников в пределах бюджета токенов.
+
+    Фрагменты ранжируются по BM25 относительно темы и ключевых слов,
+    затем жадно набираются до исчерпания бюджета. Результат — по одной
+    строке на источник, фрагменты внутри источника идут в исходном порядке.
+    """
+    if budget <= 0:
+        return []
+    query_terms = set(_terms(query))
+
+    passages = []  # (номер источника, номер фрагмента, текст, термины)
+    for source_idx, text in enumerate(sources):
+        for passage_idx, passage in enumerate(split_passages(text)):
+            passages.append((source_idx, passage_idx, passage, Counter(_terms(passage))))
+    if not passages:
+        return []
+
+    doc_freq = Counter(term for *_, terms in passages for term in terms.keys() & query_terms)
+    avg_len = sum(sum(terms.values()) for *_, terms in passages) / len(passages) or 1
+
+    def score(terms: Counter) -> float:
+        length = sum(terms.values())
+        total = 0.0
+        for term in query_terms:
+            tf = terms.get(term, 0)
+            if not tf:
+                continue
+            idf = math.log(1 + (len(passages) - doc_freq[term] + 0.5) / (doc_freq[term] + 0.5))
+            total += idf * tf * (_K1 + 1) / (tf + _K1 * (1 - _B + _B * length / avg_len))
+        return total
+
+    ranked = sorted(passages, key=lambda item: score(item[3]), reverse=True)
+    selected = []
+    used = 0
+    for source_idx, passage_idx, passage, terms in ranked:
+        cost = estimate_tokens(passage)
+        if used + cost > budget:
+            continue
+        selected.append((source_idx, passage_idx, passage))
+        used += cost
+
+    packed: dict[int, list[str]] = {}
+    for source_idx, _, passage in sorted(selected):
+        packed.setdefault(source_idx, []).append(passage)
+    return ['\n'.join(parts) for parts in packed.values()]
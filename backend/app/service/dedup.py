@@ -0,0 +1,87 @@
+import hashlib
+import re
+import numpy as np
+from app.core.config import settings
+
+_WORD_RE = re.compile(r'\w+')
+# Простое число Мерсенна для универсального хеширования (как в классическом MinHash)
+_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def _shingles(text: str, size: int) -> set[str]:
+    """Множество словесных шинглов текста."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) <= size:
+        return {' '.join(words)} if words else set()
+    return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+
+def _permutations(num_perm: int) -> tuple[np.ndarray, np.ndarray]:
+    """Фиксированные коэффициенты хеш-функций вида (a * x + b) mod p."""
+    rng = np.random.RandomState(1)
+    a = rng.randint(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.randint(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash(text: str, num_perm: int, shingle_size: int) -> np.ndarray:
+    """MinHash-сигнатура текста."""
+    shingles = _shingles(text, shingle_size)
+    if not shingles:
+        return np.full(num_perm, _MAX_HASH, dtype=np.uint64)
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), 'little')
+         for s in shingles),
+        dtype=np.uint64, count=len(shingles),
+    )
+    a, b = _permutations(num_perm)
+    return ((np.outer(a, hashes) + b[:, None]) % _PRIME & _MAX_HASH).min(axis=1)
+
+
+def deduplicate(texts: list[str]) -> list[str]:
+    """
+    Убирает почти одинаковые тексты (перепечатки, зеркала).
+
+    Кандидаты на дубликаты ищутся через LSH по полосам MinHash-сигнатур,
+    пары с оценкой сходства Жаккара не ниже DEDUP_THRESHOLD объединяются
+    в кластеры. Из каждого кластера остаётся самый длинный текст на месте
+    первого вхождения кластера.
+    """
+    if len(texts) < 2:
+        return list(texts)
+    num_perm = settings.DEDUP_NUM_PERM
+    bands = settings.DEDUP_BANDS
+    rows = num_perm // bands
+    signatures = [minhash(text, num_perm, settings.DEDUP_SHINGLE_SIZE) for text in texts]
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for band in range(bands):
+        buckets: dict[bytes, list[int]] = {}
+        for idx, signature in enumerate(signatures):
+            key = signature[band * rows:(band + 1) * rows].tobytes()
+            buckets.setdefault(key, []).append(idx)
+        for members in buckets.values():
+            first = members[0]
+            for other in members[1:]:
+                if find(first) == find(other):
+                    continue
+                similarity = np.mean(signatures[first] == signatures[other])
+                if similarity >= settings.DEDUP_THRESHOLD:
+                    parent[find(other)] = find(first)
+
+    clusters: dict[int, list[int]] = {}
+    for idx in range(len(texts)):
+        clusters.setdefault(find(idx), []).append(idx)
+    representatives = sorted(
+        (members[0], max(members, key=lambda i: len(texts[i])))
+        for members in clusters.values()
+    )
+    return [texts[best] for _, best in representatives]
@@ -0,0 +1,97 @@
+import asyncio
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+from app.core.config import settings
+
+# Пул процессов для CPU-тяжёлого разбора HTML (lxml + эвристики newspaper3k),
+# чтобы парсинг не блокировал event loop и масштабировался по ядрам.
+_pool: Optional[ProcessPoolExecutor] = None
+
+
+def extract_text(html: bytes, url: str = '') -> str:
+    """Извлекает чистый текст статьи из HTML с помощью newspaper3k."""
+    # newspaper3k тяжёлый: импортируется при первом разборе (или заранее, см. load_extractor)
+    from newspaper import Article
+    try:
+        article = Article(url)
+        article.download(input_html=html)
+        article.parse()
+        return article.text
+    except Exception:
+        return ""
+
+
+def load_extractor() -> None:
+    """Импортирует newspaper3k заранее, например в мастер-процессе до fork воркеров."""
+    import newspaper  # noqa: F401
+
+
+def get_extract_pool() -> ProcessPoolExecutor:
+    """Возвращает общий пул процессов для извлечения текста."""
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(max_workers=settings.EXTRACT_WORKERS)
+    return _pool
+
+
+def shutdown_extract_pool() -> None:
+    """Останавливает пул процессов (при остановке приложения)."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def _terminate(processes: list) -> None:
+    """Завершает процессы выведенного из работы пула (разбор, превысивший таймаут)."""
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+
+
+def _recycle_pool(pool: ProcessPoolExecutor) -> None:
+    """
+    Заменяет пул, в котором разбор страницы не уложился в таймаут.
+
+    Зависший процесс иначе занимал бы слот пула до конца разбора. Новые
+    страницы сразу идут в новый пул, остальным задачам старого даётся ещё
+    EXTRACT_TIMEOUT, после чего его процессы завершаются.
+    """
+    global _pool
+    if _pool is not pool:
+        return  # пул уже заменён другим вызовом
+    _pool = None
+    # У ProcessPoolExecutor нет публичного способа прервать выполняющуюся задачу,
+    # а после shutdown список его процессов уже недоступен
+    processes = list((pool._processes or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    asyncio.get_running_loop().call_later(settings.EXTRACT_TIMEOUT, _terminate, processes)
+
+
+async def extract_one(html: bytes, url: str = '') -> str:
+    """Извлекает текст одной страницы в пуле процессов с ограничением по времени."""
+    global _pool
+    loop = asyncio.get_running_loop()
+    pool = get_extract_pool()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(pool, extract_text, html, url),
+            timeout=settings.EXTRACT_TIMEOUT,
+        )
+    except asyncio.TimeoutError:
+        _recycle_pool(pool)
+        return ""
+    except BrokenProcessPool:
+        # Упавший воркер ломает весь пул — пересоздаём его при следующем вызове
+        if _pool is pool:
+            _pool = None
+        return ""
+    except Exception:
+        return ""
+
+
+async def extract_many(pages: dict[str, bytes]) -> dict[str, str]:
+    """Параллельно извлекает текст из набора страниц {url: html}."""
+    texts = await asyncio.gather(*(extract_one(html, url) for url, html in pages.items()))
+    return dict(zip(pages, texts))
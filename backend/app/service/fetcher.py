@@ -0,0 +1,117 @@
+import asyncio
+import urllib.parse
+import httpx
+from dataclasses import dataclass
+from typing import Callable, Optional
+from app.core.config import settings
+
+# Общий HTTP-клиент для загрузки страниц-источников.
+_client: Optional[httpx.AsyncClient] = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """Возвращает общий асинхронный HTTP-клиент с пулом соединений."""
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.FETCH_URL_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=settings.FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.FETCH_MAX_CONNECTIONS,
+            ),
+            headers={"User-Agent": settings.FETCH_USER_AGENT},
+            follow_redirects=True,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    """Закрывает общий HTTP-клиент (при остановке приложения)."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+class FetchLimits:
+    """Ограничения параллельности загрузки: общее и на каждый хост."""
+
+    def __init__(self) -> None:
+        self.total = asyncio.Semaphore(settings.FETCH_MAX_CONCURRENCY)
+        self._hosts: dict[str, asyncio.Semaphore] = {}
+
+    def for_host(self, url: str) -> asyncio.Semaphore:
+        host = urllib.parse.urlsplit(url).hostname or ''
+        if host not in self._hosts:
+            self._hosts[host] = asyncio.Semaphore(settings.FETCH_MAX_PER_HOST)
+        return self._hosts[host]
+
+
+@dataclass
+class FetchedPage:
+    """Ответ сервера на загрузку страницы (status 304 — страница не изменилась)."""
+    status: int
+    content: bytes
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+
+
+async def _fetch_one(url: str, global_limit: asyncio.Semaphore,
+                     host_limit: asyncio.Semaphore,
+                     headers: Optional[dict] = None) -> FetchedPage:
+    """Загружает одну страницу с учётом общих и per-host ограничений."""
+    # Сначала слот хоста, потом общий: задачи в очереди к медленному хосту
+    # не должны занимать общие слоты, пока ждут
+    async with host_limit, global_limit:
+        response = await asyncio.wait_for(
+            get_http_client().get(url, headers=headers),
+            timeout=settings.FETCH_URL_TIMEOUT
+        )
+        if response.status_code != 304:
+            response.raise_for_status()
+        return FetchedPage(
+            status=response.status_code,
+            content=response.content,
+            etag=response.headers.get('etag'),
+            last_modified=response.headers.get('last-modified'),
+        )
+
+
+async def fetch_pages(urls: list[str],
+                      headers: Optional[dict[str, dict]] = None,
+                      on_done: Optional[Callable[[str], None]] = None,
+                      limits: Optional[FetchLimits] = None) -> dict[str, FetchedPage]:
+    """
+    Параллельно загружает страницы по списку URL.
+
+    headers — дополнительные заголовки для отдельных URL (например, для
+    условных запросов), on_done вызывается по завершении загрузки каждого URL.
+    limits позволяет нескольким вызовам делить одни ограничения параллельности.
+    Возвращает только те страницы, которые успели загрузиться за общий
+    бюджет времени; упавшие и не успевшие пропускаются.
+    """
+    headers = headers or {}
+    urls = list(dict.fromkeys(url for url in urls if url))
+    if not urls:
+        return {}
+
+    limits = limits or FetchLimits()
+    tasks = {}
+    for url in urls:
+        task = asyncio.create_task(
+            _fetch_one(url, limits.total, limits.for_host(url), headers.get(url)))
+        tasks[task] = url
+        if on_done is not None:
+            task.add_done_callback(lambda _, url=url: on_done(url))
+
+    done, pending = await asyncio.wait(tasks, timeout=settings.FETCH_TOTAL_TIMEOUT)
+    for task in pending:
+        task.cancel()
+    await asyncio.gather(*pending, return_exceptions=True)
+
+    # Сохраняем исходный порядок выдачи
+    pages = {}
+    for task, url in tasks.items():
+        if task in done and task.exception() is None:
+            pages[url] = task.result()
+    return pages
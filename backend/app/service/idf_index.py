@@ -0,0 +1,211 @@
+import re
+import threading
+import time
+from collections import Counter
+from typing import Iterable, Optional, Protocol
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, delete, select
+from app.core.config import settings, russian_stop_words
+from app.core.upsert import insert
+from app.models.article import Article
+from app.models.term import TermFrequency
+from app.service.lemmatizer import lemmatizer
+
+_CLEAN_RE = re.compile(r'\W+')
+# Слова из двух и более символов, как token_pattern в TfidfVectorizer
+_TOKEN_RE = re.compile(r'(?u)\b\w\w+\b')
+_STOP_WORDS = frozenset(russian_stop_words)
+_MAX_TERM_LENGTH = 100
+_DOCUMENTS = ''  # строка индекса с числом всех статей
+_UPSERT_BATCH = 1000  # строк в одном INSERT … ON CONFLICT
+_PENDING = 'idf_index_pending'  # ключ session.info: изменения, ждущие commit
+
+
+def lemmatize_articles(texts: list[str]) -> list[str]:
+    """Тексты в нижнем регистре без знаков препинания, слова приведены к леммам (один проход)."""
+    return lemmatizer.lemmatize_many([_CLEAN_RE.sub(' ', text.lower()) for text in texts])
+
+
+def keyword_terms(lemmatized_text: str) -> list[str]:
+    """Леммы, участвующие в подборе ключевых слов (без стоп-слов и однобуквенных)."""
+    return [term for term in _TOKEN_RE.findall(lemmatized_text) if term not in _STOP_WORDS]
+
+
+class IdfListener(Protocol):
+    """Получатель изменений индекса (например, движок анализа текста)."""
+
+    def reset(self, documents: int, frequencies: dict[str, int]) -> None: ...
+
+    def update(self, documents: int, deltas: dict[str, int]) -> None: ...
+
+
+class IdfIndex:
+    """
+    Документные частоты лемм по всем сохранённым статьям.
+
+    Индекс хранится в таблице TermFrequency и обновляется в той же транзакции,
+    что и статьи; частоты в памяти меняются только после её успешного commit.
+    Каждый воркер загружает его один раз (и перечитывает раз в
+    reload_seconds, чтобы видеть изменения других воркеров); пустой индекс при
+    первой загрузке строится по всем статьям.
+    """
+
+    def __init__(self, reload_seconds: int) -> None:
+        self.reload_seconds = reload_seconds
+        self.documents = 0
+        self.version = 0  # растёт при каждом изменении индекса в памяти
+        self._frequencies: dict[str, int] = {}
+        self._loaded_at: Optional[float] = None
+        self._listeners: list[IdfListener] = []
+        self._lock = threading.Lock()  # загрузка из базы
+        self._version_lock = threading.Lock()  # частоты в памяти
+
+    def ensure_loaded(self, session: Session) -> None:
+        """Загружает индекс, если он ещё не загружен или устарел."""
+        loaded_at = self._loaded_at
+        if loaded_at is not None and (
+                self.reload_seconds <= 0 or time.monotonic() - loaded_at < self.reload_seconds):
+            return
+        with self._lock:
+            if self._loaded_at == loaded_at:
+                self.load(session)
+
+    def load(self, session: Session) -> None:
+        """Читает индекс из базы; пустой индекс строится по всем статьям."""
+        rows = session.exec(select(TermFrequency)).all()
+        if not rows:
+            try:
+                self.rebuild(session)
+            except IntegrityError:
+                # Индекс одновременно построил другой воркер
+                session.rollback()
+            rows = session.exec(select(TermFrequency)).all()
+        frequencies = {row.term: row.documents for row in rows}
+        documents = frequencies.pop(_DOCUMENTS, 0)
+        with self._version_lock:
+            self.documents = documents
+            self._frequencies = frequencies
+            self.version += 1
+            for listener in self._listeners:
+                listener.reset(documents, frequencies)
+        self._loaded_at = time.monotonic()
+
+    def rebuild(self, session: Session, batch_size: int = 500) -> None:
+        """Пересчитывает индекс по всем статьям."""
+        for row in session.exec(select(TermFrequency)).all():
+            session.delete(row)
+        counts: Counter = Counter()
+        documents = 0
+        offset = 0
+        while True:
+            contents = session.exec(
+                select(Article.content).order_by(Article.id).offset(offset).limit(batch_size)).all()
+            if not contents:
+                break
+            for terms in self._document_terms(contents):
+                counts.update(terms)
+                documents += 1
+            offset += batch_size
+        if documents:
+            counts[_DOCUMENTS] = documents
+            session.add_all(TermFrequency(term=term, documents=count) for term, count in counts.items())
+        session.commit()
+
+    @staticmethod
+    def _document_terms(contents: Iterable[str]) -> list[set[str]]:
+        return [{term for term in keyword_terms(text) if len(term) <= _MAX_TERM_LENGTH}
+                for text in lemmatize_articles(list(contents))]
+
+    def add(self, session: Session, contents: list[str]) -> None:
+        """
+        Учитывает новые статьи; изменения фиксирует commit вызывающего.
+
+        Вызывается до добавления статей в сессию: при первой загрузке индекс
+        строится по уже сохранённым статьям.
+        """
+        self._apply(session, self._document_terms(contents), [])
+
+    def remove(self, session: Session, contents: list[str]) -> None:
+        """Убирает из индекса удаляемые статьи."""
+        self._apply(session, [], self._document_terms(contents))
+
+    def replace(self, session: Session, old: str, new: str) -> None:
+        """Учитывает изменение текста статьи."""
+        old_terms, new_terms = self._document_terms([old, new])
+        self._apply(session, [new_terms - old_terms], [old_terms - new_terms], documents=0)
+
+    def _apply(self, session: Session, added: list[set[str]], removed: list[set[str]],
+               documents: Optional[int] = None) -> None:
+        self.ensure_loaded(session)
+        deltas: Counter = Counter()
+        for terms in added:
+            deltas.update(terms)
+        for terms in removed:
+            deltas.subtract(terms)
+        deltas[_DOCUMENTS] = len(added) - len(removed) if documents is None else documents
+        deltas = {term: delta for term, delta in sorted(deltas.items()) if delta}
+        if not deltas:
+            return
+        # Относительные изменения одним upsert: параллельные сохранения статей
+        # (другие воркеры, очередь заданий) не теряют обновлений и не конфликтуют
+        # на новых леммах; строки блокируются в одном порядке
+        items = list(deltas.items())
+        for start in range(0, len(items), _UPSERT_BATCH):
+            statement = insert(session, TermFrequency).values(
+                [{'term': term, 'documents': delta} for term, delta in items[start:start + _UPSERT_BATCH]])
+            session.exec(statement.on_conflict_do_update(
+                index_elements=[TermFrequency.term],
+                set_={'documents': TermFrequency.documents + statement.excluded.documents}))
+        removed_terms = [term for term, delta in items if delta < 0]
+        for start in range(0, len(removed_terms), _UPSERT_BATCH):
+            session.exec(delete(TermFrequency).where(
+                TermFrequency.term.in_(removed_terms[start:start + _UPSERT_BATCH]),
+                TermFrequency.documents <= 0))
+        session.info.setdefault(_PENDING, []).append((self, deltas))
+
+    def _commit(self, deltas: dict[str, int]) -> None:
+        """Переносит в память изменения зафиксированной транзакции."""
+        terms = {term: delta for term, delta in deltas.items() if term != _DOCUMENTS}
+        with self._version_lock:
+            self.version += 1
+            self.documents = max(0, self.documents + deltas.get(_DOCUMENTS, 0))
+            for term, delta in terms.items():
+                if self._frequencies.get(term, 0) + delta > 0:
+                    self._frequencies[term] = self._frequencies.get(term, 0) + delta
+                else:
+                    self._frequencies.pop(term, None)
+            for listener in self._listeners:
+                listener.update(self.documents, terms)
+
+    def subscribe(self, listener: IdfListener) -> None:
+        """
+        Подписывает на изменения индекса в памяти.
+
+        listener.reset получает весь индекс сразу и после каждой загрузки из
+        базы, listener.update — изменения каждой зафиксированной транзакции.
+        """
+        with self._version_lock:
+            if listener not in self._listeners:
+                self._listeners.append(listener)
+                listener.reset(self.documents, self._frequencies)
+
+    def snapshot(self) -> tuple[int, int, dict[str, int]]:
+        """Версия, число статей и копия документных частот на один момент."""
+        with self._version_lock:
+            return self.version, self.documents, dict(self._frequencies)
+
+
+@event.listens_for(Session, 'after_commit')
+def _after_commit(session: Session) -> None:
+    for index, deltas in session.info.pop(_PENDING, []):
+        index._commit(deltas)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _after_rollback(session: Session) -> None:
+    # Статьи не сохранились — индекс в памяти остаётся как в базе
+    session.info.pop(_PENDING, None)
+
+
+idf_index = IdfIndex(settings.IDF_INDEX_RELOAD_SECONDS)
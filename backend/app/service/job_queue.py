@@ -0,0 +1,238 @@
+import asyncio
+import logging
+import uuid
+from collections import deque
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlmodel import Session, select, update
+from app.core.config import settings
+from app.core.db import engine
+from app.crud import create_article
+from app.models.article import ArticleCreate
+from app.models.avatar import Avatar
+from app.models.job import GenerationJob
+from app.service.BaseGPT import BaseGPT
+from app.service.LongFormGPT import LongFormGPT
+from app.service.metrics import stage
+from app.service.upstream import is_transient_error
+
+logger = logging.getLogger(__name__)
+
+
+class JobQueue:
+    """
+    Очередь фоновой генерации статей с пулом воркеров.
+
+    Задания хранятся в таблице GenerationJob и переживают перезапуск процесса.
+    Воркеры выбирают задания по кругу между пользователями, чтобы один
+    пользователь с большой пачкой заданий не занимал все воркеры.
+    """
+
+    def __init__(self, workers: int, max_attempts: int, retry_delay: float) -> None:
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._queues: dict[uuid.UUID, deque] = {}
+        self._owners: deque = deque()
+        self._ready = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._retries: set[asyncio.Task] = set()
+        self._running: set[uuid.UUID] = set()  # задания, взятые воркерами этого процесса
+
+    def submit(self, job_id: uuid.UUID, owner_id: uuid.UUID) -> None:
+        """Ставит задание в очередь пользователя."""
+        if owner_id not in self._queues:
+            self._queues[owner_id] = deque()
+            self._owners.append(owner_id)
+        self._queues[owner_id].append(job_id)
+        self._ready.set()
+
+    async def _next(self) -> uuid.UUID:
+        """Берёт следующее задание, переходя к очереди следующего пользователя."""
+        while not self._owners:
+            self._ready.clear()
+            await self._ready.wait()
+        owner_id = self._owners.popleft()
+        queue = self._queues[owner_id]
+        job_id = queue.popleft()
+        if queue:
+            self._owners.append(owner_id)
+        else:
+            del self._queues[owner_id]
+        return job_id
+
+    async def start(self) -> None:
+        """Восстанавливает незавершённые задания из базы и запускает воркеров."""
+        if self.workers <= 0:
+            return
+        for job_id, owner_id in await asyncio.to_thread(self._load_pending):
+            self.submit(job_id, owner_id)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self) -> None:
+        """Останавливает воркеров; прерванные задания возвращаются в очередь и будут подхвачены при следующем старте."""
+        tasks = [*self._tasks, *self._retries]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._retries.clear()
+        # Очередь в памяти восстанавливается из базы при старте
+        self._queues.clear()
+        self._owners.clear()
+        if self._running:
+            await asyncio.to_thread(self._requeue, list(self._running))
+            self._running.clear()
+
+    def _requeue(self, job_ids: list[uuid.UUID]) -> None:
+        """Возвращает прерванные задания в очередь, не засчитывая попытку."""
+        with Session(engine) as session:
+            session.exec(
+                update(GenerationJob)
+                .where(GenerationJob.id.in_(job_ids), GenerationJob.status == 'running')
+                .values(status='queued', attempts=GenerationJob.attempts - 1,
+                        updated_at=datetime.utcnow())
+            )
+            session.commit()
+
+    def _load_pending(self) -> list[tuple[uuid.UUID, uuid.UUID]]:
+        """Возвращает ожидающие задания и зависшие в статусе running после падения процесса."""
+        stale = datetime.utcnow() - timedelta(seconds=settings.JOB_RUNNING_TIMEOUT)
+        with Session(engine) as session:
+            # Задание, исчерпавшее попытки, больше не запускается: каждая попытка — платная генерация
+            session.exec(
+                update(GenerationJob)
+                .where(GenerationJob.status == 'running', GenerationJob.updated_at < stale,
+                       GenerationJob.attempts >= self.max_attempts)
+                .values(status='failed', error='Превышено число попыток', updated_at=datetime.utcnow())
+            )
+            session.exec(
+                update(GenerationJob)
+                .where(GenerationJob.status == 'running', GenerationJob.updated_at < stale)
+                .values(status='queued', updated_at=datetime.utcnow())
+            )
+            session.commit()
+            jobs = session.exec(
+                select(GenerationJob.id, GenerationJob.owner_id)
+                .where(GenerationJob.status == 'queued')
+                .order_by(GenerationJob.created_at)
+            ).all()
+        return list(jobs)
+
+    async def _worker(self) -> None:
+        while True:
+            job_id = await self._next()
+            try:
+                await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f'Ошибка обработки задания {job_id}: {e}')
+
+    def _claim(self, job_id: uuid.UUID) -> Optional[tuple[GenerationJob, Avatar]]:
+        """Атомарно переводит задание в running, чтобы его не взял другой процесс."""
+        with Session(engine) as session:
+            claimed = session.exec(
+                update(GenerationJob)
+                .where(GenerationJob.id == job_id, GenerationJob.status == 'queued',
+                       GenerationJob.attempts < self.max_attempts)
+                .values(status='running', attempts=GenerationJob.attempts + 1,
+                        updated_at=datetime.utcnow())
+            ).rowcount
+            session.commit()
+            if not claimed:
+                return None
+            job = session.get(GenerationJob, job_id)
+            return job, session.get(Avatar, job.avatar_id)
+
+    def _finish(self, job_id: uuid.UUID, content: str, name: str) -> None:
+        """Сохраняет статью и отмечает задание выполненным."""
+        with stage('save'), Session(engine) as session:
+            job = session.get(GenerationJob, job_id)
+            article = create_article(
+                session=session,
+                article_create=ArticleCreate(content=content, name=name),
+                owner_id=job.owner_id
+            )
+            job.status = 'done'
+            job.article_id = article.id
+            job.error = None
+            job.updated_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+
+    def _fail(self, job_id: uuid.UUID, error: str, retry: bool) -> None:
+        with Session(engine) as session:
+            job = session.get(GenerationJob, job_id)
+            job.status = 'queued' if retry else 'failed'
+            job.error = error
+            job.updated_at = datetime.utcnow()
+            session.add(job)
+            session.commit()
+
+    async def _retry_later(self, job_id: uuid.UUID, owner_id: uuid.UUID, delay: float) -> None:
+        await asyncio.sleep(delay)
+        self.submit(job_id, owner_id)
+
+    async def _run(self, job_id: uuid.UUID) -> None:
+        claimed = await asyncio.to_thread(self._claim, job_id)
+        if claimed is None:
+            return
+        job, avatar = claimed
+        self._running.add(job_id)
+        try:
+            await self._process(job, avatar)
+        except asyncio.CancelledError:
+            # Задание остаётся в _running: stop() вернёт его в очередь
+            raise
+        except Exception:
+            self._running.discard(job_id)
+            raise
+        self._running.discard(job_id)
+
+    async def _process(self, job: GenerationJob, avatar: Optional[Avatar]) -> None:
+        job_id = job.id
+        if avatar is None:
+            await asyncio.to_thread(self._fail, job_id, 'Аватар был удалён', False)
+            return
+
+        gpt_class = LongFormGPT if job.long_form else BaseGPT
+        gpt = gpt_class(
+            avatar=avatar,
+            theme=job.theme,
+            key_words=job.key_words,
+            len_article=job.len_article,
+            model=job.model,
+            goal=job.goal,
+            is_global_role=bool(job.goal),
+            hedge=job.hedge,
+            research_mode=job.research_mode
+        )
+        try:
+            result = await gpt.generate_article()
+            if not result['content']:
+                raise ValueError('Модель вернула пустой ответ')
+        except Exception as e:
+            error = getattr(e, 'detail', None) or str(e)
+            retry = is_transient_error(e) and job.attempts < self.max_attempts
+            await asyncio.to_thread(self._fail, job_id, error, retry)
+            if retry:
+                # Экспоненциальная пауза перед повтором
+                delay = self.retry_delay * 2 ** (job.attempts - 1)
+                task = asyncio.create_task(self._retry_later(job_id, job.owner_id, delay))
+                self._retries.add(task)
+                task.add_done_callback(self._retries.discard)
+            return
+        try:
+            await asyncio.to_thread(self._finish, job_id, result['content'], job.theme)
+        except Exception as e:
+            # Без этого задание осталось бы в running и после перезапуска сгенерировалось бы заново
+            logger.error(f'Ошибка сохранения статьи задания {job_id}: {e}')
+            await asyncio.to_thread(self._fail, job_id, f'Ошибка сохранения статьи: {e}', False)
+
+
+job_queue = JobQueue(
+    workers=settings.JOB_WORKERS,
+    max_attempts=settings.JOB_MAX_ATTEMPTS,
+    retry_delay=settings.JOB_RETRY_DELAY,
+)
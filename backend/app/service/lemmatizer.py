@@ -0,0 +1,73 @@
+import threading
+from collections import OrderedDict
+from typing import Iterable
+from app.core.config import settings
+
+
+class Lemmatizer:
+    """
+    Лемматизатор русского текста с общим на процесс LRU-кэшем «словоформа → лемма».
+
+    Разбор pymorphy2 — самая дорогая часть анализа текста, поэтому каждая
+    словоформа разбирается один раз: внутри запроса повторы схлопываются,
+    между запросами леммы берутся из кэша. Словари pymorphy2 загружаются
+    при первом разборе (или заранее через load, см. PRELOAD_MODELS).
+    """
+
+    def __init__(self, cache_size: int) -> None:
+        self.cache_size = cache_size
+        self._morph = None
+        self._load_lock = threading.Lock()
+        self._cache: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self):
+        """Загружает словари морфологии, если они ещё не загружены."""
+        if self._morph is None:
+            with self._load_lock:
+                if self._morph is None:
+                    import pymorphy2
+                    self._morph = pymorphy2.MorphAnalyzer()
+        return self._morph
+
+    def lemmas(self, words: Iterable[str]) -> dict[str, str]:
+        """Леммы для множества словоформ (каждая разбирается не больше одного раза)."""
+        forms = dict.fromkeys(words)
+        result = {}
+        with self._lock:
+            for form in forms:
+                lemma = self._cache.get(form)
+                if lemma is not None:
+                    self._cache.move_to_end(form)
+                    result[form] = lemma
+            self.hits += len(result)
+            self.misses += len(forms) - len(result)
+        missing = [form for form in forms if form not in result]
+        if missing:
+            morph = self.load()
+            parsed = {form: morph.parse(form)[0].normal_form for form in missing}
+            with self._lock:
+                self._cache.update(parsed)
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+            result.update(parsed)
+        return result
+
+    def lemmatize(self, text: str) -> str:
+        """Приводит каждое слово текста (слова разделены пробелами) к базовой форме."""
+        return self.lemmatize_many([text])[0]
+
+    def lemmatize_many(self, texts: list[str]) -> list[str]:
+        """Лемматизирует несколько текстов за один проход по их общему словарю."""
+        tokenized = [text.split() for text in texts]
+        lemmas = self.lemmas(word for words in tokenized for word in words)
+        return [' '.join(lemmas[word] for word in words) for words in tokenized]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._cache)}
+
+
+lemmatizer = Lemmatizer(settings.LEMMA_CACHE_SIZE)
@@ -0,0 +1,41 @@
+import httpx
+from openai import AsyncOpenAI
+from typing import Optional
+from app.core.config import settings
+
+# Один клиент на процесс: пул соединений и keep-alive переиспользуются
+# всеми запросами на генерацию вместо создания клиента на каждый вызов.
+_client: Optional[AsyncOpenAI] = None
+
+
+def get_llm_client() -> AsyncOpenAI:
+    """Возвращает общий асинхронный клиент для OpenAI-совместимого API."""
+    global _client
+    if _client is None:
+        http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(
+                settings.LLM_READ_TIMEOUT,
+                connect=settings.LLM_CONNECT_TIMEOUT,
+            ),
+            limits=httpx.Limits(
+                max_connections=settings.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.LLM_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _client = AsyncOpenAI(
+            api_key=settings.VSE_GPT_KEY,
+            base_url=settings.LLM_BASE_URL,
+            http_client=http_client,
+            # Повторы выполняет app.service.upstream, встроенные отключены
+            max_retries=0,
+        )
+    return _client
+
+
+async def close_llm_client() -> None:
+    """Закрывает общий клиент и его пул соединений (при остановке приложения)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
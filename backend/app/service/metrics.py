@@ -0,0 +1,217 @@
+import os
+import re
+import secrets
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Iterator, Optional
+from prometheus_client import (CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram,
+                               generate_latest, multiprocess)
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from app.core.config import settings
+
+# Несколько воркеров gunicorn (gunicorn.conf.py): значения метрик каждый процесс пишет
+# в файлы общего каталога, /metrics суммирует их по всем воркерам
+_MULTIPROCESS = bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+if _MULTIPROCESS:
+    _registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(_registry)
+else:
+    _registry = REGISTRY
+
+TRACE_HEADER = 'X-Trace-Id'
+_TRACE_ID_RE = re.compile(r'^[\w-]{1,64}$')
+
+# Длительности от миллисекунд до нескольких минут (генерация длинных статей)
+_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+_SIZE_BUCKETS = (1 << 10, 4 << 10, 16 << 10, 64 << 10, 256 << 10, 1 << 20, 4 << 20, 16 << 20)
+
+HTTP_REQUESTS = Counter(
+    'http_requests_total', 'Число HTTP-запросов', ['method', 'route', 'status'])
+HTTP_DURATION = Histogram(
+    'http_request_duration_seconds', 'Длительность HTTP-запросов (до конца тела ответа)',
+    ['method', 'route'], buckets=_DURATION_BUCKETS)
+STAGE_DURATION = Histogram(
+    'generation_stage_duration_seconds', 'Длительность стадий конвейера генерации',
+    ['stage'], buckets=_DURATION_BUCKETS)
+LLM_TOKENS = Counter(
+    'llm_tokens_total', 'Токены модели: prompt и completion', ['model', 'kind'])
+PAYLOAD_BYTES = Histogram(
+    'generation_payload_bytes', 'Размеры данных конвейера: выдача поиска, страницы, промпт',
+    ['kind'], buckets=_SIZE_BUCKETS)
+UPSTREAM_CIRCUIT_STATE = Gauge(
+    'upstream_circuit_state', 'Состояние предохранителя: 0 — закрыт, 1 — пробный запрос, 2 — открыт',
+    ['upstream', 'key'], multiprocess_mode='livemax')
+UPSTREAM_RETRIES = Counter(
+    'upstream_retries_total', 'Повторы запросов к внешним API', ['upstream'])
+UPSTREAM_REJECTED = Counter(
+    'upstream_rejected_total', 'Запросы, отклонённые без обращения к внешнему API',
+    ['upstream', 'reason'])
+RESEARCH_SOURCES = Counter(
+    'research_sources_total', 'Откуда взят контекст статьи: сниппеты выдачи или страницы',
+    ['mode', 'source'])
+LLM_FIRST_TOKEN_SECONDS = Histogram(
+    'llm_first_token_seconds', 'Время до первого фрагмента потокового ответа модели',
+    ['model'], buckets=_DURATION_BUCKETS)
+LLM_HEDGED_REQUESTS = Counter(
+    'llm_hedged_requests_total', 'Запросы, продублированные в запасную модель',
+    ['model', 'fallback', 'winner'])
+UPSTREAM_THROTTLE_SECONDS = Histogram(
+    'upstream_throttle_seconds', 'Ожидание в ограничителе частоты запросов',
+    ['upstream'], buckets=_DURATION_BUCKETS)
+
+# Завершённые стадии текущего запроса (только при включённой трассировке)
+_spans: ContextVar[Optional[list]] = ContextVar('spans', default=None)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Замеряет длительность стадии конвейера (в том числе при ошибке)."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_DURATION.labels(name).observe(elapsed)
+        spans = _spans.get()
+        if spans is not None:
+            spans.append((name, elapsed))
+
+
+def observe_payload(kind: str, size: int) -> None:
+    """Записывает размер данных конвейера в байтах."""
+    PAYLOAD_BYTES.labels(kind).observe(size)
+
+
+def record_llm_usage(model: str, prompt_tokens: int, completion_tokens: int) -> None:
+    """Учитывает расход токенов модели."""
+    LLM_TOKENS.labels(model, 'prompt').inc(prompt_tokens)
+    LLM_TOKENS.labels(model, 'completion').inc(completion_tokens)
+
+
+class StatsCollector:
+    """
+    Отдаёт в Prometheus счётчики компонента из его метода stats().
+
+    Счётчики stats() живут в памяти процесса, поэтому при нескольких воркерах
+    у каждой серии есть метка pid воркера, ответившего на запрос. С max_age
+    результат stats() переиспользуется между опросами в течение max_age секунд.
+    """
+
+    def __init__(self, component: str, stats: Callable[[], dict], counters: tuple[str, ...],
+                 max_age: float = 0) -> None:
+        self.component = component
+        self.stats = stats
+        self.counters = counters
+        self.max_age = max_age
+        self._cached: Optional[tuple[float, dict]] = None
+
+    def _stats(self) -> dict:
+        cached = self._cached
+        if cached is not None and time.monotonic() - cached[0] < self.max_age:
+            return cached[1]
+        stats = self.stats()
+        self._cached = (time.monotonic(), stats)
+        return stats
+
+    def describe(self):
+        # Без describe реестр вызвал бы collect (и запрос к БД) уже при регистрации
+        return []
+
+    def collect(self):
+        # pid — во время выдачи: коллекторы регистрируются в мастере до fork
+        labels = {'pid': str(os.getpid())} if _MULTIPROCESS else {}
+        for key, value in self._stats().items():
+            name = f'{self.component}_{key}'
+            family = CounterMetricFamily if key in self.counters else GaugeMetricFamily
+            metric = family(name, f'{self.component}: {key}', labels=list(labels))
+            metric.add_metric(list(labels.values()), value)
+            yield metric
+
+
+def register_stats(component: str, stats: Callable[[], dict],
+                   counters: tuple[str, ...] = ('hits', 'misses', 'revalidated',
+                                                'leaders', 'followers'),
+                   max_age: float = 0) -> None:
+    """Регистрирует компонент со счётчиками stats() в реестре метрик."""
+    _registry.register(StatsCollector(component, stats, counters, max_age))
+
+
+def metrics_authorized(authorization: Optional[str]) -> bool:
+    """Проверяет заголовок Authorization запроса к /metrics (Bearer METRICS_TOKEN)."""
+    if not settings.METRICS_TOKEN or not authorization:
+        return False
+    expected = f'Bearer {settings.METRICS_TOKEN}'.encode()
+    return secrets.compare_digest(authorization.encode(), expected)
+
+
+def metrics_payload() -> tuple[bytes, str]:
+    """Метрики в текстовом формате Prometheus и их Content-Type."""
+    return generate_latest(_registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware: гистограммы длительности запросов по шаблону маршрута.
+
+    Длительность считается до отправки последнего фрагмента тела, поэтому
+    для потоковых ответов учитывается вся генерация. При TRACING_ENABLED
+    в ответ добавляются X-Trace-Id (из запроса или новый) и Server-Timing
+    со стадиями, завершившимися до отправки заголовков.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        status = 500
+        observed = False
+        trace_id = None
+        if settings.TRACING_ENABLED:
+            incoming = dict(scope['headers']).get(TRACE_HEADER.lower().encode(), b'').decode('latin-1')
+            trace_id = incoming if _TRACE_ID_RE.match(incoming) else uuid.uuid4().hex
+        spans_token = _spans.set([] if trace_id else None)
+        spans = _spans.get()
+
+        def observe() -> None:
+            nonlocal observed
+            if not observed:
+                observed = True
+                self._observe(scope, status, started)
+
+        async def send_wrapper(message) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+                if trace_id:
+                    headers = list(message.get('headers', []))
+                    headers.append((TRACE_HEADER.lower().encode(), trace_id.encode()))
+                    if spans:
+                        timing = ', '.join(f'{name};dur={elapsed * 1000:.1f}' for name, elapsed in spans)
+                        headers.append((b'server-timing', timing.encode()))
+                    message = {**message, 'headers': headers}
+            elif message['type'] == 'http.response.body' and not message.get('more_body', False):
+                observe()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            observe()
+            raise
+        finally:
+            _spans.reset(spans_token)
+
+    @staticmethod
+    def _observe(scope, status: int, started: float) -> None:
+        route = scope.get('route')
+        # Шаблон маршрута, а не фактический путь — чтобы не плодить серии
+        path = getattr(route, 'path', None) or 'unmatched'
+        HTTP_REQUESTS.labels(scope['method'], path, str(status)).inc()
+        HTTP_DURATION.labels(scope['method'], path).observe(time.perf_counter() - started)
@@ -0,0 +1,113 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+from app.core.config import settings
+from app.service.metrics import LLM_FIRST_TOKEN_SECONDS, LLM_HEDGED_REQUESTS
+from app.service.upstream import CircuitBreaker, llm_upstream
+
+T = TypeVar('T')
+
+
+class ModelRouter:
+    """
+    Хеджирование запросов к моделям по статистике времени до первого токена.
+
+    Если основная модель не ответила первым фрагментом за срок (квантиль её
+    недавних задержек) или упала, тот же запрос уходит в самую быструю из
+    доступных запасных моделей из ACTIVE_MODELS. Берётся первый ответ,
+    второй запрос отменяется.
+    """
+
+    def __init__(self, window: int) -> None:
+        self.window = window
+        self._samples: dict[str, deque] = {}
+
+    def _add_sample(self, model: str, seconds: float) -> None:
+        self._samples.setdefault(model, deque(maxlen=self.window)).append(seconds)
+
+    def record_first_token(self, model: str, seconds: float) -> None:
+        """Учитывает время до первого фрагмента ответа модели."""
+        LLM_FIRST_TOKEN_SECONDS.labels(model).observe(seconds)
+        self._add_sample(model, seconds)
+
+    def _quantile(self, model: str, q: float) -> Optional[float]:
+        samples = self._samples.get(model)
+        if not samples or len(samples) < settings.HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(samples)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def deadline(self, model: str) -> float:
+        """Сколько ждать первый токен основной модели, прежде чем дублировать запрос."""
+        latency = self._quantile(model, settings.HEDGE_LATENCY_QUANTILE)
+        if latency is None:
+            return settings.HEDGE_FIRST_TOKEN_DEADLINE
+        return min(max(latency, settings.HEDGE_MIN_DEADLINE), settings.HEDGE_FIRST_TOKEN_DEADLINE)
+
+    def fallback_for(self, model: str) -> Optional[str]:
+        """Самая быстрая доступная модель с контекстным окном не меньше, чем у основной."""
+        windows = settings.MODEL_CONTEXT_WINDOWS
+        window = windows.get(model, settings.CONTEXT_DEFAULT_WINDOW)
+        candidates = [
+            candidate for candidate in settings.ACTIVE_MODELS
+            if candidate != model
+            and windows.get(candidate, settings.CONTEXT_DEFAULT_WINDOW) >= window
+            and llm_upstream.breaker(candidate).state != CircuitBreaker.OPEN
+        ]
+        # Модели без статистики считаем средними, чтобы они тоже получали запросы
+        return min(
+            candidates,
+            key=lambda candidate: (self._quantile(candidate, 0.5) or settings.HEDGE_FIRST_TOKEN_DEADLINE / 2,
+                                   candidate),
+            default=None,
+        )
+
+    async def hedge(self, model: str, start: Callable[[str], Awaitable[T]],
+                    discard: Callable[[T], Awaitable[None]]) -> tuple[str, T]:
+        """
+        Запускает start(model) и при необходимости start(запасная модель).
+
+        Возвращает модель, ответившую первой, и её результат; результат
+        проигравшей стороны, если он всё же успел прийти, закрывается discard.
+        """
+        started = time.perf_counter()
+        tasks = {asyncio.create_task(start(model)): model}
+        fallback = None
+        winner = None
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.deadline(model))
+            if not done or next(iter(done)).exception() is not None:
+                fallback = self.fallback_for(model)
+                if fallback is not None:
+                    tasks[asyncio.create_task(start(fallback))] = fallback
+
+            error = None
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None and winner is None:
+                        winner = task
+                    elif task.exception() is not None:
+                        # Упавшую модель отодвигаем в конец очереди на роль запасной
+                        self._add_sample(tasks[task], settings.HEDGE_FIRST_TOKEN_DEADLINE)
+                        error = error or task.exception()
+                if winner is not None:
+                    return tasks[winner], winner.result()
+            raise error
+        finally:
+            for task, name in tasks.items():
+                if task is winner:
+                    continue
+                if not task.done():
+                    task.cancel()
+                    # Ответа не дождались: время ожидания — нижняя оценка задержки модели
+                    self._add_sample(name, time.perf_counter() - started)
+                elif not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+            if fallback is not None:
+                LLM_HEDGED_REQUESTS.labels(model, fallback, tasks[winner] if winner else 'none').inc()
+
+
+model_router = ModelRouter(settings.HEDGE_LATENCY_WINDOW)
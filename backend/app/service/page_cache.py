@@ -0,0 +1,160 @@
+import hashlib
+import urllib.parse
+from datetime import datetime, timedelta
+from sqlmodel import Session, delete, func, select
+from app.core.config import settings
+from app.core.db import engine
+from app.core.upsert import insert
+from app.models.cache import PageCacheEntry
+
+# Параметры отслеживания, которые не меняют содержимое страницы
+_TRACKING_PARAMS = ('utm_', 'yclid', 'gclid', 'fbclid')
+_DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+
+def canonical_url(url: str) -> str:
+    """Приводит URL к каноническому виду для использования в качестве ключа кэша."""
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f'{host}:{parts.port}'
+    query = sorted(
+        (name, value)
+        for name, value in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith(_TRACKING_PARAMS)
+    )
+    return urllib.parse.urlunsplit(
+        (scheme, host, parts.path or '/', urllib.parse.urlencode(query), ''))
+
+
+def _make_key(url: str) -> str:
+    return hashlib.sha256(canonical_url(url).encode()).hexdigest()
+
+
+class PageCache:
+    """
+    Кэш извлечённого текста страниц с условной ревалидацией (ETag/Last-Modified).
+
+    Записи моложе fresh_ttl отдаются без обращения к сети, остальные
+    ревалидируются условным GET. Суммарный объём текста ограничен max_bytes,
+    сверх него вытесняются давно не использованные записи.
+    """
+
+    def __init__(self, fresh_ttl_seconds: int, max_bytes: int) -> None:
+        self.fresh_ttl = timedelta(seconds=fresh_ttl_seconds)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+    def get_many(self, urls: list[str]) -> dict[str, dict]:
+        """
+        Возвращает записи кэша для списка URL: {url: {text, etag, last_modified, fresh}}.
+
+        Записи с пустым текстом (неудачное извлечение) считаются промахом,
+        чтобы страница загрузилась целиком, а не ревалидировалась в тот же пустой текст.
+        """
+        keys = {_make_key(url): url for url in urls}
+        with Session(engine) as session:
+            entries = session.exec(
+                select(PageCacheEntry).where(PageCacheEntry.key.in_(list(keys)), PageCacheEntry.text != '')
+            ).all()
+            now = datetime.utcnow()
+            result = {
+                keys[entry.key]: {
+                    'text': entry.text,
+                    'etag': entry.etag,
+                    'last_modified': entry.last_modified,
+                    'fresh': now - entry.fetched_at <= self.fresh_ttl,
+                }
+                for entry in entries
+            }
+        self.hits += sum(1 for entry in result.values() if entry['fresh'])
+        return result
+
+    @staticmethod
+    def conditional_headers(entry: dict) -> dict:
+        """Заголовки условного запроса для ревалидации записи."""
+        headers = {}
+        if entry.get('etag'):
+            headers['If-None-Match'] = entry['etag']
+        if entry.get('last_modified'):
+            headers['If-Modified-Since'] = entry['last_modified']
+        return headers
+
+    def touch(self, urls: list[str], revalidated: bool = False) -> None:
+        """Отмечает использование записей; ревалидированные считаются заново загруженными."""
+        if not urls:
+            return
+        with Session(engine) as session:
+            now = datetime.utcnow()
+            entries = session.exec(
+                select(PageCacheEntry).where(
+                    PageCacheEntry.key.in_([_make_key(url) for url in urls]))
+            ).all()
+            for entry in entries:
+                entry.accessed_at = now
+                if revalidated:
+                    entry.fetched_at = now
+                session.add(entry)
+            session.commit()
+        if revalidated:
+            self.revalidated += len(urls)
+
+    def put_many(self, pages: dict[str, dict]) -> None:
+        """Сохраняет страницы {url: {text, etag, last_modified}} и соблюдает лимит объёма; пустые тексты не кэшируются."""
+        pages = {url: page for url, page in pages.items() if page['text']}
+        if not pages:
+            return
+        now = datetime.utcnow()
+        # Один URL могут одновременно извлечь несколько конвейеров (пакет тем
+        # с общими источниками), поэтому запись — upsert, а не get-or-insert
+        rows = {}
+        for url, page in pages.items():
+            key = _make_key(url)
+            rows[key] = {
+                'key': key, 'url': canonical_url(url), 'text': page['text'],
+                'etag': page.get('etag'), 'last_modified': page.get('last_modified'),
+                'size': len(page['text'].encode()), 'fetched_at': now, 'accessed_at': now,
+            }
+        with Session(engine) as session:
+            statement = insert(session, PageCacheEntry).values(list(rows.values()))
+            session.exec(statement.on_conflict_do_update(
+                index_elements=[PageCacheEntry.key],
+                set_={name: statement.excluded[name] for name in
+                      ('text', 'etag', 'last_modified', 'size', 'fetched_at', 'accessed_at')}))
+            session.commit()
+            self._evict(session)
+        self.misses += len(pages)
+
+    def _evict(self, session: Session) -> None:
+        """Удаляет давно не использованные записи, пока объём превышает лимит."""
+        total = session.exec(select(func.sum(PageCacheEntry.size))).one() or 0
+        if total <= self.max_bytes:
+            return
+        rows = session.exec(
+            select(PageCacheEntry.key, PageCacheEntry.size).order_by(PageCacheEntry.accessed_at)
+        )
+        stale = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            stale.append(key)
+            total -= size
+        session.exec(delete(PageCacheEntry).where(PageCacheEntry.key.in_(stale)))
+        session.commit()
+
+    def stats(self) -> dict:
+        """Счётчики попаданий/ревалидаций/промахов и текущий размер кэша."""
+        with Session(engine) as session:
+            size = session.exec(select(func.count()).select_from(PageCacheEntry)).one()
+            total = session.exec(select(func.sum(PageCacheEntry.size))).one() or 0
+        return {'hits': self.hits, 'revalidated': self.revalidated,
+                'misses': self.misses, 'size': size, 'bytes': total}
+
+
+page_cache = PageCache(
+    fresh_ttl_seconds=settings.PAGE_CACHE_FRESH_TTL,
+    max_bytes=settings.PAGE_CACHE_MAX_BYTES,
+)
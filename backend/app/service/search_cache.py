@@ -0,0 +1,88 @@
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+from sqlmodel import Session, delete, func, select, update
+from app.core.config import settings
+from app.core.db import engine
+from app.core.upsert import insert
+from app.models.cache import SearchCacheEntry
+
+# Параметры, которые не влияют на выдачу и не должны попадать в ключ
+_IGNORED_PARAMS = {'apikey', 'folderid'}
+
+
+class SearchCache:
+    """Персистентный кэш результатов поиска Яндекса с TTL и LRU-вытеснением."""
+
+    def __init__(self, ttl_seconds: int, max_entries: int) -> None:
+        self.ttl = timedelta(seconds=ttl_seconds)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(params: dict) -> str:
+        """Строит ключ по нормализованному запросу и параметрам поиска."""
+        normalized = {
+            name: ' '.join(str(value).lower().split())
+            for name, value in params.items() if name not in _IGNORED_PARAMS
+        }
+        raw = json.dumps(normalized, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(raw.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[dict]:
+        """Возвращает результат из кэша или None, если записи нет или она устарела."""
+        with Session(engine) as session:
+            now = datetime.utcnow()
+            entry = session.get(SearchCacheEntry, key)
+            if entry is None or now - entry.created_at > self.ttl:
+                if entry is not None:
+                    # Условный DELETE: запись могли одновременно удалить или обновить
+                    session.exec(delete(SearchCacheEntry).where(
+                        SearchCacheEntry.key == key, SearchCacheEntry.created_at < now - self.ttl))
+                    session.commit()
+                self.misses += 1
+                return None
+            payload = entry.payload
+            session.exec(update(SearchCacheEntry).where(
+                SearchCacheEntry.key == key).values(accessed_at=now))
+            session.commit()
+            self.hits += 1
+            return json.loads(payload)
+
+    def set(self, key: str, query: str, value: dict) -> None:
+        """Сохраняет результат поиска и вытесняет давно не использованные записи."""
+        with Session(engine) as session:
+            now = datetime.utcnow()
+            # Один и тот же запрос могут одновременно сохранять несколько конвейеров
+            statement = insert(session, SearchCacheEntry).values(
+                key=key, query=query, payload=json.dumps(value, ensure_ascii=False),
+                created_at=now, accessed_at=now)
+            session.exec(statement.on_conflict_do_update(
+                index_elements=[SearchCacheEntry.key],
+                set_={name: statement.excluded[name] for name in ('payload', 'created_at', 'accessed_at')}))
+            session.commit()
+            self._evict(session)
+
+    def _evict(self, session: Session) -> None:
+        """Удаляет самые давно использованные записи сверх max_entries."""
+        size = session.exec(select(func.count()).select_from(SearchCacheEntry)).one()
+        if size <= self.max_entries:
+            return
+        stale = select(SearchCacheEntry.key).order_by(
+            SearchCacheEntry.accessed_at).limit(size - self.max_entries)
+        session.exec(delete(SearchCacheEntry).where(SearchCacheEntry.key.in_(stale)))
+        session.commit()
+
+    def stats(self) -> dict:
+        """Счётчики попаданий/промахов и текущий размер кэша."""
+        with Session(engine) as session:
+            size = session.exec(select(func.count()).select_from(SearchCacheEntry)).one()
+        return {'hits': self.hits, 'misses': self.misses, 'size': size}
+
+
+search_cache = SearchCache(
+    ttl_seconds=settings.SEARCH_CACHE_TTL,
+    max_entries=settings.SEARCH_CACHE_MAX_ENTRIES,
+)
@@ -0,0 +1,42 @@
+import re
+
+_KEYWORD_SEPARATORS = re.compile(r'[,;\n]+')
+
+
+def build_queries(theme: str, key_words: str, pages: int, max_keyword_queries: int) -> list[tuple[str, int]]:
+    """
+    Варианты поискового запроса в порядке важности: (текст запроса, страница выдачи).
+
+    Основной запрос «тема + ключевые слова» идёт по нескольким страницам,
+    за ним запрос только по теме и по запросу на каждое ключевое слово.
+    """
+    theme = ' '.join(theme.split())
+    keywords = [' '.join(word.split()) for word in _KEYWORD_SEPARATORS.split(key_words)]
+    keywords = [word for word in dict.fromkeys(keywords) if word]
+    queries = [(f'{theme} + {key_words}', page) for page in range(max(1, pages))]
+    queries.append((theme, 0))
+    if len(keywords) > 1:
+        queries += [(f'{theme} {word}', 0) for word in keywords[:max_keyword_queries]]
+    return list(dict.fromkeys(queries))
+
+
+def fuse_results(rankings: list[list[dict]], k: int, limit: int) -> list[dict]:
+    """
+    Объединяет выдачи нескольких запросов по URL методом reciprocal rank fusion.
+
+    Документ получает сумму 1 / (k + место) по всем выдачам, где он встретился;
+    при равенстве выше тот, что раньше встретился в более важной выдаче.
+    Возвращает не больше limit лучших результатов.
+    """
+    scores: dict[str, float] = {}
+    entries: dict[str, dict] = {}
+    for ranking in rankings:
+        for rank, entry in enumerate(ranking, start=1):
+            url = entry.get('url')
+            if not url:
+                continue
+            scores[url] = scores.get(url, 0.0) + 1.0 / (k + rank)
+            entries.setdefault(url, entry)
+    order = {url: i for i, url in enumerate(entries)}
+    best = sorted(entries, key=lambda url: (-scores[url], order[url]))
+    return [entries[url] for url in best[:limit]]
@@ -0,0 +1,183 @@
+import codecs
+import re
+import threading
+from collections import Counter
+from typing import Optional
+import numpy as np
+from app.service.idf_index import IdfIndex, idf_index, keyword_terms
+from app.service.lemmatizer import lemmatizer
+
+# Словоформы так же, как после re.sub(r'\W+', ' ', ...) и split() в lemmatize_articles
+_WORD_RE = re.compile(r'\w+')
+_WORD_PREFIX_RE = re.compile(r'\w*')
+# Незаконченное слово длиннее этого не переносится в следующий кусок, а разбирается
+# как есть: иначе тело без разделителей копировалось бы в перенос целиком
+_MAX_CARRY = 100
+
+
+class KeywordAnalyzer:
+    """
+    Движок подбора ключевых слов, создаётся один раз на процесс.
+
+    Вместо обучения векторизатора на каждом запросе используется
+    фиксированный словарь (лемма → столбец) с вектором документных частот:
+    он строится один раз при загрузке индекса IDF, а сохранения статей
+    только дописывают новые столбцы и меняют частоты на месте. Тексты пакета
+    складываются в одну разреженную матрицу в формате CSR
+    (data/indices/indptr), веса умножаются на IDF одной векторной операцией,
+    а топ-N каждой строки выбирается частичной сортировкой (argpartition) без
+    сортировки всей строки.
+    """
+
+    def __init__(self, index: IdfIndex) -> None:
+        self.index = index
+        self._subscribed = False
+        self._lock = threading.Lock()
+        self._documents = 0
+        self._columns: dict[str, int] = {}
+        self._df = np.empty(0)  # с запасом под новые столбцы
+
+    def prepare(self) -> None:
+        """Подписывается на индекс IDF: строит словарь и вектор частот по его текущему состоянию."""
+        if not self._subscribed:
+            self.index.subscribe(self)
+            self._subscribed = True
+
+    def reset(self, documents: int, frequencies: dict[str, int]) -> None:
+        columns = dict(zip(frequencies, range(len(frequencies))))
+        df = np.fromiter(frequencies.values(), dtype=np.float64, count=len(frequencies))
+        with self._lock:
+            self._documents, self._columns, self._df = documents, columns, df
+
+    def update(self, documents: int, deltas: dict[str, int]) -> None:
+        with self._lock:
+            self._documents = documents
+            new_terms = [term for term in deltas if term not in self._columns]
+            size = len(self._columns) + len(new_terms)
+            if size > len(self._df):
+                df = np.zeros(max(size, 2 * len(self._df)))
+                df[:len(self._df)] = self._df
+                self._df = df
+            for term in new_terms:
+                self._columns[term] = len(self._columns)
+            # Леммы, ушедшие из индекса, остаются столбцами с нулевой частотой до перезагрузки
+            for term, delta in deltas.items():
+                column = self._columns[term]
+                self._df[column] = max(0.0, self._df[column] + delta)
+
+    def analyze(self, texts: list[str], top_n: int) -> list[dict]:
+        """
+        Ключевые слова (TF-IDF) и статистика для пакета текстов.
+
+        Словоформы считаются по каждому тексту, а лемматизируются и
+        разбиваются на термины только различные формы всего пакета.
+        """
+        forms = [Counter(_WORD_RE.findall(text.lower())) for text in texts]
+        lemmas = lemmatizer.lemmas(form for text_forms in forms for form in text_forms)
+        return self._score(
+            [self.term_counts(text_forms, lemmas) for text_forms in forms],
+            [(len(text), sum(text_forms.values())) for text, text_forms in zip(texts, forms)],
+            top_n,
+        )
+
+    @staticmethod
+    def term_counts(forms: Counter, lemmas: dict[str, str]) -> Counter:
+        """Счётчики лемм-терминов по счётчикам словоформ (в порядке первого появления)."""
+        counts: Counter = Counter()
+        for form, count in forms.items():
+            for term in keyword_terms(lemmas[form]):
+                counts[term] += count
+        return counts
+
+    def stream(self, encoding: str = 'utf-8') -> 'TextStreamAnalysis':
+        """Анализ текста, поступающего кусками."""
+        return TextStreamAnalysis(self, encoding)
+
+    def _score(self, rows: list[Counter], texts: list[tuple[int, int]], top_n: int) -> list[dict]:
+        """Топ-N ключевых слов по счётчикам лемм; texts — пары (число символов, число слов)."""
+        self.prepare()
+        terms: list[str] = []
+        counts: list[int] = []
+        indptr = [0]
+        for term_counts in rows:
+            terms.extend(term_counts)
+            counts.extend(term_counts.values())
+            indptr.append(len(terms))
+
+        with self._lock:
+            columns = np.fromiter((self._columns.get(term, -1) for term in terms), dtype=np.int64, count=len(terms))
+            known = columns >= 0
+            term_df = np.zeros(len(terms))
+            term_df[known] = self._df[columns[known]]
+            documents = self._documents
+        # Сглаженный IDF, как в TfidfVectorizer(smooth_idf=True); у лемм вне словаря df = 0
+        term_idf = np.log((1 + documents) / (1 + term_df)) + 1
+        # Нормировка строки не меняет ни порядок, ни доли весов, поэтому не нужна
+        weights = np.array(counts, dtype=np.float64) * term_idf
+
+        results = []
+        for row, (num_characters, num_words) in enumerate(texts):
+            start, end = indptr[row], indptr[row + 1]
+            row_weights = weights[start:end]
+            size = min(max(int(top_n), 1), len(row_weights))
+            best = np.argpartition(-row_weights, size - 1)[:size] if size else np.arange(0)
+            # По убыванию веса, при равенстве — в порядке появления в тексте
+            best = best[np.lexsort((best, -row_weights[best]))]
+            total = row_weights.sum()
+            results.append({
+                "keywords": [
+                    {"word": terms[start + i], "count": round(float(row_weights[i] / total * num_words))}
+                    for i in best
+                ],
+                "statistics": {
+                    "num_characters": num_characters,
+                    "num_words": num_words
+                }
+            })
+        return results
+
+
+class TextStreamAnalysis:
+    """
+    Анализ текста, поступающего кусками (загрузка большого файла).
+
+    Байты декодируются инкрементально, незаконченное на границе куска слово
+    переносится в следующий кусок. Хранятся только счётчики словоформ, так что
+    память ограничена словарём текста, а не его размером; результат тот же,
+    что у KeywordAnalyzer.analyze для всего текста.
+    """
+
+    def __init__(self, analyzer: KeywordAnalyzer, encoding: str = 'utf-8') -> None:
+        self.analyzer = analyzer
+        self._decoder = codecs.getincrementaldecoder(encoding)(errors='replace')
+        self._carry = ''
+        self._forms: Counter = Counter()
+        self.num_characters = 0
+        self.num_words = 0
+
+    def feed(self, data: bytes) -> None:
+        self._consume(self._decoder.decode(data), final=False)
+
+    def _consume(self, text: str, final: bool) -> None:
+        self.num_characters += len(text)
+        text = self._carry + text
+        if not final:
+            # Хвост после последнего разделителя может быть началом слова из следующего куска;
+            # ищется с конца (по развёрнутому тексту), чтобы не было квадратичного перебора
+            tail = len(_WORD_PREFIX_RE.match(text[:-_MAX_CARRY - 2:-1]).group())
+            cut = len(text) - tail if tail <= _MAX_CARRY else len(text)
+            text, self._carry = text[:cut], text[cut:]
+        else:
+            self._carry = ''
+        words = _WORD_RE.findall(text.lower())
+        self.num_words += len(words)
+        self._forms.update(words)
+
+    def result(self, top_n: int) -> dict:
+        """Завершает разбор и возвращает ключевые слова и статистику."""
+        self._consume(self._decoder.decode(b'', final=True), final=True)
+        term_counts = self.analyzer.term_counts(self._forms, lemmatizer.lemmas(self._forms))
+        return self.analyzer._score([term_counts], [(self.num_characters, self.num_words)], top_n)[0]
+
+
+keyword_analyzer = KeywordAnalyzer(idf_index)
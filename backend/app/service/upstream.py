@@ -0,0 +1,226 @@
+import asyncio
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+import httpx
+import openai
+from tenacity import AsyncRetrying, RetryCallState, retry_if_exception, stop_after_attempt, wait_random_exponential
+from app.core.config import settings
+from app.service.yandex_xml import YandexSearchError
+from app.service.metrics import (
+    UPSTREAM_CIRCUIT_STATE,
+    UPSTREAM_REJECTED,
+    UPSTREAM_RETRIES,
+    UPSTREAM_THROTTLE_SECONDS,
+)
+
+T = TypeVar('T')
+
+_TRANSIENT_ERRORS = (
+    httpx.TransportError,
+    openai.APIConnectionError,
+)
+
+
+class UpstreamUnavailable(Exception):
+    """Внешний сервис временно недоступен: предохранитель открыт или очередь к нему слишком длинная."""
+
+    def __init__(self, upstream: str, reason: str, retry_after: float) -> None:
+        super().__init__(f'{upstream}: {reason}')
+        self.upstream = upstream
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+def _status_code(exc: BaseException) -> Optional[int]:
+    if isinstance(exc, httpx.HTTPStatusError):
+        return exc.response.status_code
+    if isinstance(exc, (openai.APIStatusError, YandexSearchError)):
+        return exc.status_code
+    return None
+
+
+def is_transient_error(exc: BaseException) -> bool:
+    """Проверяет, вызвана ли ошибка временным сбоем внешнего сервиса."""
+    while exc is not None:
+        if isinstance(exc, (*_TRANSIENT_ERRORS, UpstreamUnavailable)):
+            return True
+        status = _status_code(exc)
+        if status is not None:
+            return status == 429 or status >= 500
+        exc = exc.__cause__
+    return False
+
+
+def _retry_after(exc: BaseException) -> float:
+    """Значение заголовка Retry-After ответа (в секундах), если он есть."""
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return 0.0
+    try:
+        return max(0.0, float(response.headers.get('retry-after', 0)))
+    except ValueError:
+        return 0.0
+
+
+class TokenBucket:
+    """Ограничитель частоты: rate запросов в секунду со всплеском до burst."""
+
+    def __init__(self, rate: float, burst: int) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def reserve(self) -> float:
+        """Бронирует токен и возвращает, сколько секунд ждать его появления."""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return max(0.0, -self.tokens / self.rate)
+
+    def cancel(self) -> None:
+        """Возвращает забронированный токен."""
+        if self.rate > 0:
+            self.tokens += 1
+
+
+class CircuitBreaker:
+    """
+    Предохранитель: после failure_threshold сбоев подряд запросы отклоняются
+    сразу, а через reset_timeout пропускается один пробный запрос.
+    """
+
+    CLOSED, HALF_OPEN, OPEN = 0, 1, 2
+
+    def __init__(self, failure_threshold: int, reset_timeout: float) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+
+    def allow(self) -> bool:
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                return False
+            self.state = self.HALF_OPEN
+        if self.state == self.HALF_OPEN:
+            if self._probing:
+                return False
+            self._probing = True
+        return True
+
+    def retry_after(self) -> float:
+        return max(0.0, self.reset_timeout - (time.monotonic() - self.opened_at))
+
+    def record_success(self) -> None:
+        self.state = self.CLOSED
+        self.failures = 0
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+            self._probing = False
+
+    def release(self) -> None:
+        """Освобождает пробный запрос, который был отменён, не дойдя до ответа."""
+        self._probing = False
+
+
+class Upstream:
+    """
+    Общая обёртка вызовов внешнего API.
+
+    Для каждого ключа (например, модели) свой ограничитель частоты и свой
+    предохранитель. Ошибки 429/5xx и сетевые сбои повторяются с
+    экспоненциальной паузой со случайной добавкой (с учётом Retry-After),
+    при открытом предохранителе вызов сразу завершается UpstreamUnavailable.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int) -> None:
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self._buckets: dict[str, TokenBucket] = {}
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._backoff = wait_random_exponential(multiplier=settings.UPSTREAM_RETRY_BASE,
+                                                max=settings.UPSTREAM_RETRY_MAX)
+
+    def breaker(self, key: str = '') -> CircuitBreaker:
+        if key not in self._breakers:
+            self._breakers[key] = CircuitBreaker(settings.UPSTREAM_BREAKER_FAILURES,
+                                                 settings.UPSTREAM_BREAKER_RESET)
+        return self._breakers[key]
+
+    def _bucket(self, key: str) -> TokenBucket:
+        if key not in self._buckets:
+            self._buckets[key] = TokenBucket(self.rate, self.burst)
+        return self._buckets[key]
+
+    def _wait(self, retry_state: RetryCallState) -> float:
+        retry_after = _retry_after(retry_state.outcome.exception())
+        return max(self._backoff(retry_state), min(retry_after, settings.UPSTREAM_RETRY_MAX))
+
+    @staticmethod
+    def _should_retry(exc: BaseException) -> bool:
+        return is_transient_error(exc) and not isinstance(exc, UpstreamUnavailable)
+
+    async def call(self, fn: Callable[[], Awaitable[T]], key: str = '') -> T:
+        """Вызывает fn с ограничением частоты, повторами и предохранителем."""
+        async for attempt in AsyncRetrying(
+            retry=retry_if_exception(self._should_retry),
+            wait=self._wait,
+            stop=stop_after_attempt(settings.UPSTREAM_MAX_ATTEMPTS),
+            before_sleep=lambda _: UPSTREAM_RETRIES.labels(self.name).inc(),
+            reraise=True,
+        ):
+            with attempt:
+                result = await self._attempt(fn, key)
+        return result
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]], key: str) -> T:
+        breaker = self.breaker(key)
+        if not breaker.allow():
+            UPSTREAM_REJECTED.labels(self.name, 'circuit_open').inc()
+            raise UpstreamUnavailable(self.name, 'circuit open', breaker.retry_after())
+        try:
+            bucket = self._bucket(key)
+            delay = bucket.reserve()
+            if delay > settings.UPSTREAM_MAX_QUEUE_WAIT:
+                # Очередь к сервису слишком длинная — отказываем сразу, а не держим запрос
+                bucket.cancel()
+                breaker.release()
+                UPSTREAM_REJECTED.labels(self.name, 'rate_limit').inc()
+                raise UpstreamUnavailable(self.name, 'rate limit', delay)
+            if delay:
+                UPSTREAM_THROTTLE_SECONDS.labels(self.name).observe(delay)
+                await asyncio.sleep(delay)
+            result = await fn()
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        except UpstreamUnavailable:
+            raise
+        except Exception as e:
+            # 429 означает, что сервис жив, просто просит снизить частоту
+            if is_transient_error(e) and _status_code(e) != 429:
+                breaker.record_failure()
+            else:
+                breaker.record_success()
+            raise
+        else:
+            breaker.record_success()
+            return result
+        finally:
+            UPSTREAM_CIRCUIT_STATE.labels(self.name, key).set(breaker.state)
+
+
+search_upstream = Upstream('yandex_search', settings.YANDEX_RATE_LIMIT, settings.YANDEX_RATE_BURST)
+llm_upstream = Upstream('llm', settings.LLM_RATE_LIMIT, settings.LLM_RATE_BURST)
@@ -0,0 +1,84 @@
+import xml.etree.ElementTree as ET
+from typing import Optional
+
+# Код «искомая комбинация слов нигде не встречается» — пустая выдача, а не сбой
+_NOT_FOUND_CODE = '15'
+# Статус HTTP, которому соответствует код ошибки: превышение частоты запросов — 429
+# (повтор с паузой), исчерпанный суточный лимит — 503 (срабатывает предохранитель);
+# остальные коды (ключ, IP, запрос) повтором не исправить
+_STATUS_BY_CODE = {'55': 429, '32': 503}
+
+
+class YandexSearchError(Exception):
+    """Ошибка, которую Yandex XML Search вернул элементом <error> в ответе с HTTP 200."""
+
+    def __init__(self, code: Optional[str], message: str) -> None:
+        super().__init__(f'Yandex XML Search: {message} (код {code})')
+        self.code = code
+        self.status_code = _STATUS_BY_CODE.get(code, 400)
+
+
+def _text(elem: Optional[ET.Element]) -> Optional[str]:
+    """Текст элемента вместе с вложенной разметкой (подсветка <hlword> в заголовках и сниппетах)."""
+    if elem is None:
+        return None
+    return ''.join(elem.itertext())
+
+
+class YandexXmlParser:
+    """
+    Потоковый разбор ответа Yandex XML Search.
+
+    Ответ подаётся кусками по мере получения, результат по каждому doc
+    отдаётся, как только элемент закрылся. Разобранные doc и group
+    удаляются из дерева, так что память не растёт с размером выдачи.
+    """
+
+    def __init__(self) -> None:
+        self._parser = ET.XMLPullParser(events=('start', 'end'))
+        self._stack: list[ET.Element] = []
+        self.results: list[dict] = []
+
+    def feed(self, data: bytes) -> list[dict]:
+        """
+        Разбирает очередной кусок ответа и возвращает закрывшиеся в нём документы.
+
+        Ошибка поиска в ответе (<error>, кроме «ничего не найдено») — YandexSearchError.
+        """
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> list[dict]:
+        """Завершает разбор (ошибка ParseError, если ответ оборван)."""
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> list[dict]:
+        new = []
+        for event, elem in self._parser.read_events():
+            if event == 'start':
+                self._stack.append(elem)
+                continue
+            self._stack.pop()
+            if elem.tag == 'error' and self._stack and self._stack[-1].tag == 'response':
+                code = elem.get('code')
+                if code != _NOT_FOUND_CODE:
+                    raise YandexSearchError(code, _text(elem) or '')
+            if elem.tag == 'doc':
+                new.append({
+                    'url': elem.findtext('url'),
+                    'title': _text(elem.find('title')),
+                    'passages': [_text(passage) for passage in elem.iterfind('passages/passage')],
+                })
+            if elem.tag in ('doc', 'group') and self._stack:
+                self._stack[-1].remove(elem)
+        self.results.extend(new)
+        return new
+
+
+def parse_yandex_xml(data: bytes) -> list[dict]:
+    """Разбирает ответ Yandex XML Search целиком."""
+    parser = YandexXmlParser()
+    parser.feed(data)
+    parser.close()
+    return parser.results
@@ -0,0 +1 @@
+from app.tests.utils.db import sqlite_engine, sqlite_session  # noqa: F401
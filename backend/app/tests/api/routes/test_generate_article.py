@@ -0,0 +1,118 @@
+import json
+from typing import AsyncIterator, Iterator
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.testclient import TestClient
+from sqlalchemy.engine import Engine
+from sqlmodel import Session, select
+
+from app import crud
+from app.api.deps import get_current_user, get_db
+from app.api.routes import generate_article
+from app.models.article import Article
+from app.models.avatar import Avatar
+from app.models.user import User
+from app.service.idf_index import IdfIndex
+
+MODEL = sorted(generate_article.settings.ACTIVE_MODELS)[0]
+
+
+class FakeGPT:
+    """Конвейер без поиска и LLM: тема 'сбой' падает, тема 'пусто' не даёт текста."""
+
+    def __init__(self, theme: str, **kwargs) -> None:
+        self.theme = theme
+
+    async def stream_article(self, on_event=None) -> AsyncIterator[str]:
+        on_event('stage', {'stage': 'generating'})
+        yield 'Первый абзац. '
+        if self.theme == 'сбой':
+            raise HTTPException(status_code=502, detail='Модель недоступна')
+        yield 'Второй абзац.'
+
+    async def generate_article(self) -> dict:
+        if self.theme == 'сбой':
+            raise HTTPException(status_code=502, detail='Модель недоступна')
+        return {'content': '' if self.theme == 'пусто' else f'Статья о {self.theme}'}
+
+
+@pytest.fixture
+def client(sqlite_engine: Engine, monkeypatch: pytest.MonkeyPatch) -> Iterator[TestClient]:
+    monkeypatch.setattr(generate_article, 'engine', sqlite_engine)
+    monkeypatch.setattr(generate_article, 'BaseGPT', FakeGPT)
+    monkeypatch.setattr(crud, 'idf_index', IdfIndex(reload_seconds=0))
+    with Session(sqlite_engine) as session:
+        user = User(email='author@example.com', hashed_password='')
+        avatar = Avatar(name='Автор', description='', owner_id=user.id)
+        session.add_all([user, avatar])
+        session.commit()
+        session.refresh(user)
+        session.refresh(avatar)
+
+    def get_test_db() -> Iterator[Session]:
+        with Session(sqlite_engine) as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(generate_article.router, prefix='/article')
+    app.dependency_overrides[get_db] = get_test_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    with TestClient(app) as c:
+        c.avatar_id = str(avatar.id)
+        yield c
+
+
+def sse_events(body: str) -> list[tuple[str, dict]]:
+    events = []
+    for block in body.strip().split('\n\n'):
+        lines = dict(line.split(': ', 1) for line in block.split('\n'))
+        events.append((lines['event'], json.loads(lines['data'])))
+    return events
+
+
+def stream(client: TestClient, theme: str) -> list[tuple[str, dict]]:
+    r = client.get('/article/generate/stream', params={
+        'avatar_id': client.avatar_id, 'model': MODEL, 'theme': theme, 'key_words': 'ключ'})
+    assert r.status_code == 200
+    assert r.headers['content-type'].startswith('text/event-stream')
+    return sse_events(r.text)
+
+
+def test_stream_sends_progress_tokens_and_saved_article(client: TestClient, sqlite_engine: Engine) -> None:
+    events = stream(client, 'корутины')
+    assert [event for event, _ in events] == ['stage', 'token', 'token', 'done']
+    assert events[0][1] == {'stage': 'generating'}
+    assert ''.join(data['text'] for event, data in events if event == 'token') == 'Первый абзац. Второй абзац.'
+    with Session(sqlite_engine) as session:
+        article = session.get(Article, events[-1][1]['id'])
+    assert (article.name, article.content) == ('корутины', 'Первый абзац. Второй абзац.')
+
+
+def test_stream_error_sends_error_event_and_saves_nothing(client: TestClient, sqlite_engine: Engine) -> None:
+    events = stream(client, 'сбой')
+    assert events == [('stage', {'stage': 'generating'}), ('token', {'text': 'Первый абзац. '}),
+                      ('error', {'detail': 'Модель недоступна'})]
+    with Session(sqlite_engine) as session:
+        assert session.exec(select(Article)).all() == []
+
+
+def test_batch_reports_each_item_and_keeps_going_after_a_failure(
+        client: TestClient, sqlite_engine: Engine) -> None:
+    r = client.post('/article/generate/batch', json={
+        'avatar_id': client.avatar_id, 'model': MODEL,
+        'items': [{'theme': theme, 'key_words': 'ключ'} for theme in ['корутины', 'сбой', 'пусто', 'потоки']],
+    })
+    assert r.status_code == 200
+    body = r.json()
+    assert (body['count'], body['failed']) == (4, 2)
+    assert [(item['theme'], item['status'], item['error']) for item in body['data']] == [
+        ('корутины', 'done', None),
+        ('сбой', 'failed', 'Модель недоступна'),
+        ('пусто', 'failed', 'Ошибка при генерации статьи.'),
+        ('потоки', 'done', None),
+    ]
+    with Session(sqlite_engine) as session:
+        saved = {article.id: article.content for article in session.exec(select(Article)).all()}
+    assert saved == {item['article']['id']: f'Статья о {item["theme"]}'
+                     for item in body['data'] if item['status'] == 'done'}
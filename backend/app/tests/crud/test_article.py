@@ -0,0 +1,18 @@
+import uuid
+
+from app import crud
+from app.models.article import Article
+from app.models.user import User
+from app.tests.utils.utils import random_email
+
+
+def test_article_visibility() -> None:
+    owner = User(id=uuid.uuid4(), email=random_email(), hashed_password='')
+    other = User(id=uuid.uuid4(), email=random_email(), hashed_password='')
+    superuser = User(id=uuid.uuid4(), email=random_email(), hashed_password='', is_superuser=True)
+    owned = Article(name='a', content='a', owner_id=owner.id)
+    shared = Article(name='b', content='b', owner_id=None)
+    assert crud.can_read_article(user=owner, article=owned)
+    assert crud.can_read_article(user=superuser, article=owned)
+    assert not crud.can_read_article(user=other, article=owned)
+    assert crud.can_read_article(user=other, article=shared)
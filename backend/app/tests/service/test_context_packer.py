@@ -0,0 +1,33 @@
+from app.service.context_packer import (
+    context_budget,
+    estimate_tokens,
+    pack_context,
+    split_passages,
+)
+
+RELEVANT = 'Python позволяет быстро писать асинхронные веб-сервисы на FastAPI и легко их тестировать.'
+NOISE = 'Сегодня в парке прошёл концерт духового оркестра, собравший много зрителей и гостей города.'
+
+
+def test_split_passages_drops_boilerplate() -> None:
+    text = f'Главная | Новости | Контакты\n{RELEVANT}\n\n© 2024\n{NOISE}'
+    assert split_passages(text) == [RELEVANT, NOISE]
+
+
+def test_pack_context_prefers_relevant_passages() -> None:
+    sources = [NOISE, RELEVANT, f'{NOISE}\n{RELEVANT}']
+    budget = estimate_tokens(RELEVANT) * 2
+    packed = pack_context(sources, 'Python FastAPI', budget)
+    assert packed == [RELEVANT, RELEVANT]
+
+
+def test_pack_context_respects_budget() -> None:
+    sources = ['\n'.join([RELEVANT] * 50)]
+    budget = estimate_tokens(RELEVANT) * 3
+    packed = pack_context(sources, 'Python', budget)
+    assert packed[0].split('\n') == [RELEVANT] * 3
+
+
+def test_context_budget_leaves_room_for_article() -> None:
+    assert context_budget('gpt-3.5-turbo-16k', 16000) == 0
+    assert 0 < context_budget('gpt-4-turbo', 4096)
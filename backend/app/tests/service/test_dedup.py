@@ -0,0 +1,16 @@
+from app.service.dedup import deduplicate
+
+BASE = ' '.join(f'слово{i}' for i in range(300))
+OTHER = ' '.join(f'другое{i}' for i in range(300))
+
+
+def test_deduplicate_keeps_one_copy_of_near_duplicates() -> None:
+    mirror = BASE.replace('слово7 ', 'слово7 реклама ')
+    syndicated = BASE + ' Источник: агентство новостей.'
+    result = deduplicate([BASE, OTHER, mirror, syndicated])
+    assert result == [syndicated, OTHER]
+
+
+def test_deduplicate_keeps_distinct_texts() -> None:
+    assert deduplicate([BASE, OTHER]) == [BASE, OTHER]
+    assert deduplicate([BASE]) == [BASE]
@@ -0,0 +1,38 @@
+import asyncio
+import multiprocessing
+import time
+
+import pytest
+
+from app.core.config import settings
+from app.service import extractor
+
+
+def slow_extract(html: bytes, url: str = '') -> str:
+    if html == b'slow':
+        time.sleep(30)
+    return html.decode()
+
+
+def test_timed_out_extraction_does_not_hold_a_pool_slot(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'EXTRACT_WORKERS', 1)
+    monkeypatch.setattr(settings, 'EXTRACT_TIMEOUT', 0.5)
+    monkeypatch.setattr(extractor, 'extract_text', slow_extract)
+    async def run() -> tuple[str, float, list]:
+        assert await extractor.extract_one(b'slow') == ''
+        processes = multiprocessing.active_children()
+        started = time.monotonic()
+        text = await extractor.extract_one(b'fast')
+        elapsed = time.monotonic() - started
+        await asyncio.sleep(settings.EXTRACT_TIMEOUT + 0.1)
+        return text, elapsed, processes
+
+    try:
+        text, elapsed, processes = asyncio.run(run())
+    finally:
+        extractor.shutdown_extract_pool()
+    assert extractor._pool is None and text == 'fast' and elapsed < 5
+    assert processes
+    for process in processes:
+        process.join(timeout=5)
+        assert not process.is_alive()
@@ -0,0 +1,41 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.service import fetcher
+from app.service.fetcher import FetchLimits, fetch_pages
+
+
+def test_slow_host_does_not_hold_global_slots(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'FETCH_MAX_CONCURRENCY', 2)
+    monkeypatch.setattr(settings, 'FETCH_MAX_PER_HOST', 1)
+    active = {'total': 0, 'max_total': 0, 'slow': 0, 'max_slow': 0}
+    finished = []
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        slow = request.url.host == 'slow.ru'
+        active['total'] += 1
+        active['slow'] += slow
+        active['max_total'] = max(active['max_total'], active['total'])
+        active['max_slow'] = max(active['max_slow'], active['slow'])
+        await asyncio.sleep(0.2 if slow else 0.01)
+        active['total'] -= 1
+        active['slow'] -= slow
+        finished.append(request.url.host)
+        return httpx.Response(200, content=str(request.url).encode())
+
+    async def run() -> dict:
+        monkeypatch.setattr(fetcher, '_client', httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        urls = [f'https://slow.ru/{i}' for i in range(3)] + [f'https://fast{i}.ru/' for i in range(4)]
+        try:
+            return await fetch_pages(urls, limits=FetchLimits())
+        finally:
+            await fetcher.close_http_client()
+
+    pages = asyncio.run(run())
+    assert len(pages) == 7
+    assert active['max_total'] <= 2 and active['max_slow'] == 1
+    # Быстрые хосты не ждут очереди к медленному
+    assert finished[:4] == ['fast0.ru', 'fast1.ru', 'fast2.ru', 'fast3.ru']
@@ -0,0 +1,64 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+import pytest
+from sqlmodel import Session, select, update
+
+from app.models.term import TermFrequency
+from app.service.idf_index import IdfIndex, keyword_terms
+from app.service.lemmatizer import lemmatizer
+
+
+class IdentityMorph:
+    def parse(self, word: str) -> list:
+        return [SimpleNamespace(normal_form=word)]
+
+
+def test_keyword_terms_skip_stop_words_and_single_letters() -> None:
+    assert keyword_terms('кот и я в python 3 кот') == ['кот', 'python', 'кот']
+
+
+def test_snapshot_is_a_copy_with_version() -> None:
+    index = IdfIndex(reload_seconds=0)
+    index._frequencies = {'кот': 3}
+    version, documents, frequencies = index.snapshot()
+    frequencies['пёс'] = 1
+    assert (version, documents) == (0, 0)
+    assert index.snapshot()[2] == {'кот': 3}
+
+
+@pytest.fixture
+def session(sqlite_session: Session, monkeypatch: pytest.MonkeyPatch) -> Session:
+    monkeypatch.setattr(lemmatizer, '_morph', IdentityMorph())
+    monkeypatch.setattr(lemmatizer, '_cache', OrderedDict())
+    return sqlite_session
+
+
+def stored(session: Session) -> dict[str, int]:
+    return {row.term: row.documents for row in session.exec(select(TermFrequency)).all()}
+
+
+def test_add_remove_and_replace_update_counts_relatively(session: Session) -> None:
+    index = IdfIndex(reload_seconds=0)
+    index.add(session, ['кот пёс', 'кот'])
+    session.commit()
+    assert stored(session) == {'': 2, 'кот': 2, 'пёс': 1}
+
+    # Другой воркер успел сохранить статью: его изменения не затираются
+    session.exec(update(TermFrequency).where(TermFrequency.term.in_(['', 'кот']))
+                 .values(documents=TermFrequency.documents + 1))
+    index.replace(session, 'кот пёс', 'кот сад')
+    index.remove(session, ['кот'])
+    session.commit()
+    assert stored(session) == {'': 2, 'кот': 2, 'сад': 1}
+    assert index.snapshot()[1:] == (1, {'кот': 1, 'сад': 1})
+
+
+def test_memory_changes_only_after_commit(session: Session) -> None:
+    index = IdfIndex(reload_seconds=0)
+    index.add(session, ['кот'])
+    assert index.snapshot()[1:] == (0, {})
+    session.rollback()
+    assert index.snapshot()[1:] == (0, {}) and stored(session) == {}
+    index.add(session, ['пёс'])
+    session.commit()
+    assert index.snapshot()[1:] == (1, {'пёс': 1})
@@ -0,0 +1,149 @@
+import asyncio
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from sqlmodel import Session
+
+from app.models.avatar import Avatar
+from app.models.job import GenerationJob
+from app.service import job_queue as job_queue_module
+from app.service.job_queue import JobQueue
+
+
+@pytest.fixture
+def engine(sqlite_engine, monkeypatch: pytest.MonkeyPatch):
+    monkeypatch.setattr(job_queue_module, 'engine', sqlite_engine)
+    return sqlite_engine
+
+
+def add_job(engine, **values) -> uuid.UUID:
+    with Session(engine) as session:
+        avatar = Avatar(name='Автор', description='')
+        job = GenerationJob(avatar_id=avatar.id, owner_id=uuid.uuid4(), model='m',
+                            theme='Тема', key_words='', **values)
+        session.add_all([avatar, job])
+        session.commit()
+        return job.id
+
+
+def get_job(engine, job_id: uuid.UUID) -> GenerationJob:
+    with Session(engine) as session:
+        return session.get(GenerationJob, job_id)
+
+
+def test_jobs_are_taken_round_robin_between_owners() -> None:
+    queue = JobQueue(workers=1, max_attempts=3, retry_delay=0)
+    first, second = uuid.uuid4(), uuid.uuid4()
+    for job_id, owner_id in [('a1', first), ('a2', first), ('a3', first), ('b1', second)]:
+        queue.submit(job_id, owner_id)
+
+    async def take(count: int) -> list:
+        return [await queue._next() for _ in range(count)]
+
+    assert asyncio.run(take(4)) == ['a1', 'b1', 'a2', 'a3']
+
+
+def test_claim_is_exclusive_and_respects_attempts(engine) -> None:
+    queue = JobQueue(workers=1, max_attempts=2, retry_delay=0)
+    job_id = add_job(engine)
+    exhausted = add_job(engine, attempts=2)
+    assert queue._claim(job_id)[0].status == 'running'
+    assert queue._claim(job_id) is None
+    assert queue._claim(exhausted) is None
+
+
+def test_stale_running_jobs_are_requeued_until_attempts_run_out(engine) -> None:
+    queue = JobQueue(workers=1, max_attempts=2, retry_delay=0)
+    stale = datetime.utcnow() - timedelta(days=1)
+    retried = add_job(engine, status='running', attempts=1, updated_at=stale)
+    exhausted = add_job(engine, status='running', attempts=2, updated_at=stale)
+    assert [job_id for job_id, _ in queue._load_pending()] == [retried]
+    assert get_job(engine, exhausted).status == 'failed'
+
+
+def test_transient_errors_are_retried_and_save_errors_fail_the_job(
+        engine, monkeypatch: pytest.MonkeyPatch) -> None:
+    outcomes = [httpx.ConnectError('нет связи'), {'content': 'Статья'}]
+
+    class FakeGPT:
+        def __init__(self, **kwargs) -> None:
+            pass
+
+        async def generate_article(self) -> dict:
+            outcome = outcomes.pop(0)
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+    def broken_finish(*args) -> None:
+        raise ValueError('value too long')
+
+    monkeypatch.setattr(job_queue_module, 'BaseGPT', FakeGPT)
+    queue = JobQueue(workers=1, max_attempts=3, retry_delay=0)
+    monkeypatch.setattr(queue, '_finish', broken_finish)
+    job_id = add_job(engine)
+
+    async def run() -> None:
+        await queue._run(job_id)
+        await asyncio.gather(*queue._retries)
+        await queue._run(await queue._next())
+
+    asyncio.run(run())
+    job = get_job(engine, job_id)
+    assert (job.status, job.attempts) == ('failed', 2)
+    assert 'value too long' in job.error
+
+
+def test_job_options_are_passed_to_the_generator(engine, monkeypatch: pytest.MonkeyPatch) -> None:
+    created = []
+
+    class FakeLongFormGPT:
+        def __init__(self, **kwargs) -> None:
+            created.append(kwargs)
+
+        async def generate_article(self) -> dict:
+            return {'content': 'Статья'}
+
+    monkeypatch.setattr(job_queue_module, 'LongFormGPT', FakeLongFormGPT)
+    monkeypatch.setattr(job_queue_module, 'create_article', lambda **kwargs: SimpleNamespace(id=None))
+    queue = JobQueue(workers=1, max_attempts=3, retry_delay=0)
+    job_id = add_job(engine, long_form=True, hedge=True, research_mode='fast')
+    asyncio.run(queue._run(job_id))
+    assert [(kwargs['hedge'], kwargs['research_mode']) for kwargs in created] == [(True, 'fast')]
+    assert get_job(engine, job_id).status == 'done'
+
+
+def test_job_interrupted_by_stop_runs_after_restart(engine, monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    class FakeGPT:
+        def __init__(self, **kwargs) -> None:
+            pass
+
+        async def generate_article(self) -> dict:
+            calls.append(len(calls))
+            if len(calls) == 1:
+                await asyncio.sleep(60)  # прерывается остановкой очереди
+            return {'content': 'Статья'}
+
+    monkeypatch.setattr(job_queue_module, 'BaseGPT', FakeGPT)
+    monkeypatch.setattr(job_queue_module, 'create_article', lambda **kwargs: SimpleNamespace(id=None))
+    queue = JobQueue(workers=1, max_attempts=1, retry_delay=0)
+    job_id = add_job(engine)
+
+    async def run() -> None:
+        await queue.start()
+        while not calls:
+            await asyncio.sleep(0.01)
+        await queue.stop()
+        assert (get_job(engine, job_id).status, get_job(engine, job_id).attempts) == ('queued', 0)
+        await queue.start()
+        while get_job(engine, job_id).status != 'done':
+            await asyncio.sleep(0.01)
+        await queue.stop()
+
+    asyncio.run(asyncio.wait_for(run(), timeout=10))
+    assert calls == [0, 1]
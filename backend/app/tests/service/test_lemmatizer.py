@@ -0,0 +1,34 @@
+from types import SimpleNamespace
+
+from app.service.lemmatizer import Lemmatizer
+
+
+class CountingMorph:
+    def __init__(self) -> None:
+        self.parsed = []
+
+    def parse(self, word: str) -> list:
+        self.parsed.append(word)
+        return [SimpleNamespace(normal_form=word.rstrip('ыи'))]
+
+
+def make_lemmatizer(cache_size: int) -> tuple[Lemmatizer, CountingMorph]:
+    lemmatizer = Lemmatizer(cache_size)
+    lemmatizer._morph = CountingMorph()
+    return lemmatizer, lemmatizer._morph
+
+
+def test_each_form_is_parsed_once_per_batch() -> None:
+    lemmatizer, morph = make_lemmatizer(100)
+    assert lemmatizer.lemmatize_many(['коты коты дом', 'дом коты']) == ['кот кот дом', 'дом кот']
+    assert sorted(morph.parsed) == ['дом', 'коты']
+
+
+def test_cache_is_reused_and_bounded() -> None:
+    lemmatizer, morph = make_lemmatizer(2)
+    lemmatizer.lemmatize('коты дом')
+    lemmatizer.lemmatize('коты сады')
+    assert morph.parsed == ['коты', 'дом', 'сады']
+    assert lemmatizer.stats() == {'hits': 1, 'misses': 3, 'size': 2}
+    lemmatizer.lemmatize('дом')
+    assert morph.parsed[-1] == 'дом'
@@ -0,0 +1,55 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from prometheus_client import REGISTRY
+
+from app.core.config import settings
+from app.service.metrics import MetricsMiddleware, StatsCollector, metrics_authorized
+
+
+def requests_count(route: str, status: str) -> float:
+    return REGISTRY.get_sample_value(
+        'http_requests_total', {'method': 'GET', 'route': route, 'status': status}) or 0.0
+
+
+def test_middleware_labels_requests_with_route_template() -> None:
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get('/items/{item_id}')
+    def read_item(item_id: int) -> dict:
+        return {'id': item_id}
+
+    before = requests_count('/items/{item_id}', '200'), requests_count('unmatched', '404')
+    client = TestClient(app)
+    assert client.get('/items/1').status_code == 200
+    assert client.get('/items/2').status_code == 200
+    assert client.get('/nowhere/3').status_code == 404
+    after = requests_count('/items/{item_id}', '200'), requests_count('unmatched', '404')
+    assert (after[0] - before[0], after[1] - before[1]) == (2, 1)
+    assert REGISTRY.get_sample_value(
+        'http_requests_total', {'method': 'GET', 'route': '/items/1', 'status': '200'}) is None
+
+
+def test_stats_are_reused_between_scrapes() -> None:
+    calls = []
+
+    def stats() -> dict:
+        calls.append(1)
+        return {'hits': len(calls), 'size': 10}
+
+    collector = StatsCollector('test_cache', stats, ('hits',), max_age=60)
+    first = [metric.samples[0].value for metric in collector.collect()]
+    second = [metric.samples[0].value for metric in collector.collect()]
+    assert first == second == [1, 10] and len(calls) == 1
+    collector.max_age = 0
+    assert [metric.samples[0].value for metric in collector.collect()] == [2, 10]
+
+
+def test_metrics_require_configured_token(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'METRICS_TOKEN', None)
+    assert not metrics_authorized('Bearer ')
+    monkeypatch.setattr(settings, 'METRICS_TOKEN', 'секрет')
+    assert metrics_authorized('Bearer секрет')
+    assert not metrics_authorized('Bearer другой')
+    assert not metrics_authorized(None)
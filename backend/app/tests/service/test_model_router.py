@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.service.model_router import ModelRouter
+
+
+@pytest.fixture(autouse=True)
+def models(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'ACTIVE_MODELS', {'slow', 'fast', 'small'})
+    monkeypatch.setattr(settings, 'MODEL_CONTEXT_WINDOWS', {'slow': 128000, 'fast': 128000, 'small': 16000})
+    monkeypatch.setattr(settings, 'HEDGE_FIRST_TOKEN_DEADLINE', 0.05)
+    monkeypatch.setattr(settings, 'HEDGE_MIN_DEADLINE', 0.01)
+    monkeypatch.setattr(settings, 'HEDGE_MIN_SAMPLES', 3)
+
+
+def test_deadline_follows_observed_latency() -> None:
+    router = ModelRouter(window=10)
+    assert router.deadline('slow') == 0.05
+    for seconds in (0.02, 0.02, 0.03):
+        router.record_first_token('slow', seconds)
+    assert router.deadline('slow') == 0.03
+
+
+def test_fallback_skips_models_with_smaller_context_window() -> None:
+    assert ModelRouter(window=10).fallback_for('slow') == 'fast'
+
+
+def test_hedge_returns_first_responder_and_cancels_the_other() -> None:
+    cancelled = []
+
+    async def start(model: str) -> str:
+        try:
+            await asyncio.sleep(1.0 if model == 'slow' else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(model)
+            raise
+        return f'answer from {model}'
+
+    async def discard(result: str) -> None:
+        pass
+
+    async def main() -> tuple[str, str]:
+        result = await ModelRouter(window=10).hedge('slow', start, discard)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(main()) == ('fast', 'answer from fast')
+    assert cancelled == ['slow']
+
+
+def test_hedge_without_delay_does_not_start_fallback() -> None:
+    started = []
+
+    async def start(model: str) -> str:
+        started.append(model)
+        return model
+
+    async def discard(result: str) -> None:
+        pass
+
+    assert asyncio.run(ModelRouter(window=10).hedge('slow', start, discard)) == ('slow', 'slow')
+    assert started == ['slow']
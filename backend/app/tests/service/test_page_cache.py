@@ -0,0 +1,54 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, update
+
+from app.models.cache import PageCacheEntry
+from app.service import page_cache as page_cache_module
+from app.service.page_cache import PageCache, canonical_url
+
+
+@pytest.fixture
+def cache(sqlite_engine, monkeypatch: pytest.MonkeyPatch) -> PageCache:
+    monkeypatch.setattr(page_cache_module, 'engine', sqlite_engine)
+    return PageCache(fresh_ttl_seconds=60, max_bytes=10)
+
+
+def test_canonical_url_drops_tracking_params_and_default_port() -> None:
+    assert canonical_url('HTTPS://Example.com:443?b=2&utm_source=x&a=1#top') == 'https://example.com/?a=1&b=2'
+    assert canonical_url('http://example.com:8080/path') == 'http://example.com:8080/path'
+
+
+def test_put_many_overwrites_and_stale_entries_are_revalidated(cache: PageCache) -> None:
+    cache.put_many({'https://example.com/a?utm_medium=y': {'text': 'old', 'etag': '"1"'}})
+    cache.put_many({'https://example.com/a': {'text': 'new', 'etag': '"2"', 'last_modified': 'Mon'}})
+    [entry] = cache.get_many(['https://example.com/a']).values()
+    assert (entry['text'], entry['fresh']) == ('new', True)
+
+    with Session(page_cache_module.engine) as session:
+        session.exec(update(PageCacheEntry).values(fetched_at=datetime.utcnow() - timedelta(minutes=5)))
+        session.commit()
+    entry = cache.get_many(['https://example.com/a'])['https://example.com/a']
+    assert not entry['fresh']
+    assert cache.conditional_headers(entry) == {'If-None-Match': '"2"', 'If-Modified-Since': 'Mon'}
+    cache.touch(['https://example.com/a'], revalidated=True)
+    assert cache.get_many(['https://example.com/a'])['https://example.com/a']['fresh']
+
+
+def test_least_recently_used_pages_are_evicted_over_the_limit(cache: PageCache) -> None:
+    cache.put_many({'https://example.com/a': {'text': 'aaaa'}})
+    cache.put_many({'https://example.com/b': {'text': 'bbbb'}})
+    cache.touch(['https://example.com/a'])
+    cache.put_many({'https://example.com/c': {'text': 'cccc'}})
+    assert sorted(cache.get_many(['https://example.com/a', 'https://example.com/b',
+                                  'https://example.com/c'])) == ['https://example.com/a', 'https://example.com/c']
+
+
+def test_failed_extractions_are_not_cached(cache: PageCache) -> None:
+    cache.put_many({'https://example.com/a': {'text': '', 'etag': '"1"'}})
+    assert cache.get_many(['https://example.com/a']) == {}
+    with Session(page_cache_module.engine) as session:
+        session.add(PageCacheEntry(key=page_cache_module._make_key('https://example.com/b'),
+                                   url='https://example.com/b', text='', etag='"1"'))
+        session.commit()
+    assert cache.get_many(['https://example.com/b']) == {}
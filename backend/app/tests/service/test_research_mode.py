@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from app.core.config import settings
+from app.service.BaseGPT import BaseGPT
+from app.service.context_packer import pack_context
+
+RESULTS = [
+    {'url': 'https://a.ru/1', 'title': 'Асинхронное программирование в Python: полное руководство',
+     'passages': ['asyncio позволяет писать конкурентный код', 'Корутины объявляются через async def']},
+    {'url': 'https://a.ru/1', 'title': 'Повтор', 'passages': ['Дубликат']},
+    {'url': 'https://b.ru/1', 'title': 'Без сниппетов', 'passages': []},
+]
+
+
+@pytest.fixture(autouse=True)
+def no_dedup(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'DEDUP_ENABLED', False)
+    monkeypatch.setattr(settings, 'RESEARCH_SNIPPET_RATIO', 0.25)
+
+
+def research(mode: str, len_article: int) -> tuple[list, list]:
+    gpt = BaseGPT(avatar=None, theme='тема', key_words='python', len_article=len_article,
+                  model='model', research_mode=mode)
+    fetched = []
+
+    async def search(on_results=None) -> dict:
+        on_results(RESULTS)
+        return {'search_results': RESULTS}
+
+    async def collect(urls, progress, limits) -> dict:
+        fetched.extend(urls)
+        return {url: f'страница {url}' for url in urls}
+
+    gpt._search_yandex = search
+    gpt._collect_sources = collect
+    return asyncio.run(gpt._research()), fetched
+
+
+SNIPPET = ('Асинхронное программирование в Python: полное руководство. '
+           'asyncio позволяет писать конкурентный код Корутины объявляются через async def')
+
+
+def test_snippet_sources_skip_duplicates_and_empty_passages() -> None:
+    assert BaseGPT._snippet_sources(RESULTS) == [SNIPPET]
+
+
+def test_snippet_sources_survive_context_packing() -> None:
+    assert pack_context(BaseGPT._snippet_sources(RESULTS), 'asyncio', budget=1000) == [SNIPPET]
+    assert pack_context(BaseGPT._snippet_sources([{'url': 'u', 'title': 'Python', 'passages': ['кратко']}]),
+                        'python', budget=1000) == []
+
+
+def test_fast_mode_does_not_fetch_pages() -> None:
+    assert research('fast', 100000) == ([SNIPPET], [])
+
+
+def test_adaptive_mode_fetches_pages_when_snippets_are_thin() -> None:
+    texts, fetched = research('adaptive', 100000)
+    assert fetched == ['https://a.ru/1', 'https://b.ru/1']
+    assert texts == ['страница https://a.ru/1', 'страница https://b.ru/1']
+    assert research('adaptive', 10)[1] == []
+
+
+def test_adaptive_mode_ignores_snippets_dropped_by_packing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'CONTEXT_MIN_PASSAGE_WORDS', 50)
+    assert research('adaptive', 10)[1] == ['https://a.ru/1', 'https://b.ru/1']
@@ -0,0 +1,33 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import Session, update
+
+from app.models.cache import SearchCacheEntry
+from app.service import search_cache as search_cache_module
+from app.service.search_cache import SearchCache
+
+
+@pytest.fixture
+def cache(sqlite_engine, monkeypatch: pytest.MonkeyPatch) -> SearchCache:
+    monkeypatch.setattr(search_cache_module, 'engine', sqlite_engine)
+    return SearchCache(ttl_seconds=60, max_entries=10)
+
+
+def test_set_overwrites_existing_entry(cache: SearchCache) -> None:
+    key = cache.make_key({'query': 'Python  asyncio', 'apikey': 'secret'})
+    assert key == cache.make_key({'query': 'python asyncio'})
+    cache.set(key, 'python asyncio', {'search_results': [1]})
+    cache.set(key, 'python asyncio', {'search_results': [2]})
+    assert cache.get(key) == {'search_results': [2]}
+    assert cache.stats() == {'hits': 1, 'misses': 0, 'size': 1}
+
+
+def test_expired_entry_is_deleted_even_if_already_gone(cache: SearchCache) -> None:
+    cache.set('k', 'q', {})
+    with Session(search_cache_module.engine) as session:
+        session.exec(update(SearchCacheEntry).values(created_at=datetime.utcnow() - timedelta(minutes=5)))
+        session.commit()
+    assert cache.get('k') is None
+    assert cache.get('k') is None
+    assert cache.stats()['size'] == 0
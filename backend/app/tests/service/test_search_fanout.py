@@ -0,0 +1,23 @@
+from app.service.search_fanout import build_queries, fuse_results
+
+
+def test_build_queries_covers_pages_theme_and_keywords() -> None:
+    assert build_queries('Асинхронный  Python', 'asyncio, корутины,asyncio', pages=2, max_keyword_queries=3) == [
+        ('Асинхронный Python + asyncio, корутины,asyncio', 0),
+        ('Асинхронный Python + asyncio, корутины,asyncio', 1),
+        ('Асинхронный Python', 0),
+        ('Асинхронный Python asyncio', 0),
+        ('Асинхронный Python корутины', 0),
+    ]
+
+
+def test_single_keyword_does_not_repeat_main_query() -> None:
+    assert build_queries('Python', 'asyncio', pages=1, max_keyword_queries=3) == [
+        ('Python + asyncio', 0), ('Python', 0)]
+
+
+def test_fuse_results_prefers_urls_found_by_several_queries() -> None:
+    first = [{'url': 'a'}, {'url': 'b'}, {'url': 'c'}]
+    second = [{'url': 'c'}, {'url': 'd'}]
+    assert [entry['url'] for entry in fuse_results([first, second], k=60, limit=10)] == ['c', 'a', 'b', 'd']
+    assert [entry['url'] for entry in fuse_results([first, second], k=60, limit=2)] == ['c', 'a']
@@ -0,0 +1,37 @@
+import asyncio
+
+from app.service.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution() -> None:
+    calls = 0
+
+    async def work() -> str:
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return 'article'
+
+    async def main() -> list[str]:
+        flight = SingleFlight()
+        results = await asyncio.gather(*(flight.do('key', work) for _ in range(5)))
+        assert flight.stats() == {'leaders': 1, 'followers': 4, 'in_flight': 0}
+        return results
+
+    assert asyncio.run(main()) == ['article'] * 5
+    assert calls == 1
+
+
+def test_errors_are_shared_and_key_is_released() -> None:
+    async def fail() -> None:
+        await asyncio.sleep(0.01)
+        raise ValueError('upstream')
+
+    async def main() -> None:
+        flight = SingleFlight()
+        results = await asyncio.gather(
+            flight.do('key', fail), flight.do('key', fail), return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert await flight.do('key', lambda: asyncio.sleep(0)) is None
+
+    asyncio.run(main())
@@ -0,0 +1,69 @@
+from collections import OrderedDict
+from types import SimpleNamespace
+
+import pytest
+
+from app.service.idf_index import IdfIndex
+from app.service.lemmatizer import lemmatizer
+from app.service.text_analysis import KeywordAnalyzer
+
+
+class IdentityMorph:
+    def parse(self, word: str) -> list:
+        return [SimpleNamespace(normal_form=word)]
+
+
+@pytest.fixture
+def analyzer(monkeypatch: pytest.MonkeyPatch) -> KeywordAnalyzer:
+    monkeypatch.setattr(lemmatizer, '_morph', IdentityMorph())
+    monkeypatch.setattr(lemmatizer, '_cache', OrderedDict())
+    index = IdfIndex(reload_seconds=0)
+    index.documents = 100
+    index._frequencies = {'статья': 90, 'корутина': 2}
+    return KeywordAnalyzer(index)
+
+
+def test_rare_terms_outrank_common_ones_with_the_same_count(analyzer: KeywordAnalyzer) -> None:
+    [result] = analyzer.analyze(['Статья, корутина; статья корутина новое'], top_n=2)
+    assert [keyword['word'] for keyword in result['keywords']] == ['корутина', 'новое']
+    assert result['statistics'] == {'num_characters': 39, 'num_words': 5}
+
+
+def test_batch_rows_are_scored_independently(analyzer: KeywordAnalyzer) -> None:
+    results = analyzer.analyze(['пёс кот кот', 'и', 'пёс'], top_n=10)
+    assert [[keyword['word'] for keyword in result['keywords']] for result in results] == [
+        ['кот', 'пёс'], [], ['пёс']]
+    assert [keyword['count'] for keyword in results[0]['keywords']] == [2, 1]
+
+
+def test_index_changes_are_applied_without_rebuild(analyzer: KeywordAnalyzer) -> None:
+    analyzer.prepare()
+    columns = analyzer._columns
+    analyzer.index._commit({'новое': 99, 'корутина': -2})
+    assert analyzer._columns is columns and columns['новое'] == 2
+    [result] = analyzer.analyze(['новое корутина статья'], top_n=1)
+    assert result['keywords'][0]['word'] == 'корутина'
+    analyzer.index._commit({'корутина': 100})
+    [result] = analyzer.analyze(['новое корутина'], top_n=1)
+    assert result['keywords'][0]['word'] == 'новое'
+
+
+@pytest.mark.parametrize('chunk_size', [1, 3, 7, 1024])
+def test_stream_matches_whole_text_analysis(analyzer: KeywordAnalyzer, chunk_size: int) -> None:
+    text = 'Корутины — это функции.\nКорутина ждёт; статья о корутинах, статья_2 и ёж!' * 3
+    data = text.encode()
+    analysis = analyzer.stream()
+    for i in range(0, len(data), chunk_size):
+        analysis.feed(data[i:i + chunk_size])
+    assert analysis.result(top_n=5) == analyzer.analyze([text], top_n=5)[0]
+
+
+def test_stream_does_not_carry_endless_tokens(analyzer: KeywordAnalyzer) -> None:
+    analysis = analyzer.stream()
+    for _ in range(50):
+        analysis.feed(b'a' * 1000)
+        assert len(analysis._carry) <= 100
+    analysis.feed(' кот'.encode())
+    result = analysis.result(top_n=10)
+    assert result['statistics'] == {'num_characters': 50004, 'num_words': 51}
+    assert 'кот' in [keyword['word'] for keyword in result['keywords']]
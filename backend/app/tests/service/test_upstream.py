@@ -0,0 +1,91 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.core.config import settings
+from app.service.upstream import CircuitBreaker, TokenBucket, Upstream, UpstreamUnavailable
+
+
+def _status_error(status: int) -> httpx.HTTPStatusError:
+    request = httpx.Request('GET', 'http://upstream')
+    return httpx.HTTPStatusError('error', request=request,
+                                 response=httpx.Response(status, request=request))
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(settings, 'UPSTREAM_RETRY_BASE', 0.001)
+    monkeypatch.setattr(settings, 'UPSTREAM_RETRY_MAX', 0.01)
+    monkeypatch.setattr(settings, 'UPSTREAM_MAX_ATTEMPTS', 3)
+    monkeypatch.setattr(settings, 'UPSTREAM_BREAKER_FAILURES', 2)
+    monkeypatch.setattr(settings, 'UPSTREAM_BREAKER_RESET', 60.0)
+
+
+def test_token_bucket_allows_burst_then_throttles() -> None:
+    bucket = TokenBucket(rate=10, burst=2)
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == 0
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+    bucket.cancel()
+    assert bucket.reserve() == pytest.approx(0.1, abs=0.01)
+
+
+def test_transient_errors_are_retried() -> None:
+    calls = 0
+
+    async def flaky() -> str:
+        nonlocal calls
+        calls += 1
+        if calls < 3:
+            raise _status_error(503 if calls == 1 else 429)
+        return 'ok'
+
+    assert asyncio.run(Upstream('test', rate=0, burst=1).call(flaky)) == 'ok'
+    assert calls == 3
+
+
+def test_client_errors_are_not_retried() -> None:
+    calls = 0
+
+    async def bad_request() -> None:
+        nonlocal calls
+        calls += 1
+        raise _status_error(400)
+
+    upstream = Upstream('test', rate=0, burst=1)
+    with pytest.raises(httpx.HTTPStatusError):
+        asyncio.run(upstream.call(bad_request))
+    assert calls == 1
+    assert upstream.breaker().state == CircuitBreaker.CLOSED
+
+
+def test_breaker_opens_and_fails_fast() -> None:
+    calls = 0
+
+    async def down() -> None:
+        nonlocal calls
+        calls += 1
+        raise _status_error(502)
+
+    upstream = Upstream('test', rate=0, burst=1)
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(upstream.call(down, key='model'))
+    assert calls == 2
+    assert upstream.breaker('model').state == CircuitBreaker.OPEN
+
+    with pytest.raises(UpstreamUnavailable):
+        asyncio.run(upstream.call(down, key='model'))
+    assert calls == 2
+    # Предохранитель у каждого ключа свой
+    assert upstream.breaker('other').state == CircuitBreaker.CLOSED
+
+
+def test_half_open_breaker_lets_one_probe_through() -> None:
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0)
+    breaker.record_failure()
+    assert breaker.allow()
+    assert not breaker.allow()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    assert breaker.allow()
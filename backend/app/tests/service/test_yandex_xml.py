@@ -0,0 +1,53 @@
+import pytest
+
+from app.service.upstream import is_transient_error
+from app.service.yandex_xml import YandexSearchError, YandexXmlParser, parse_yandex_xml
+
+XML = '''<?xml version="1.0" encoding="utf-8"?>
+<yandexsearch version="1.0"><response><results><grouping>
+<group><doc><url>https://a.ru/1</url><title>Асинхронный <hlword>Python</hlword></title>
+<passages><passage>Первый <hlword>сниппет</hlword></passage><passage>Второй</passage></passages></doc>
+<doc><url>https://a.ru/2</url><title>Без подсветки</title></doc></group>
+<group><doc><url>https://b.ru/1</url><title>Третий</title><passages><passage>Текст</passage></passages></doc></group>
+</grouping></results></response></yandexsearch>'''.encode()
+
+
+def test_parse_keeps_highlighted_text() -> None:
+    assert parse_yandex_xml(XML) == [
+        {'url': 'https://a.ru/1', 'title': 'Асинхронный Python',
+         'passages': ['Первый сниппет', 'Второй']},
+        {'url': 'https://a.ru/2', 'title': 'Без подсветки', 'passages': []},
+        {'url': 'https://b.ru/1', 'title': 'Третий', 'passages': ['Текст']},
+    ]
+
+
+def test_docs_are_emitted_as_soon_as_they_close() -> None:
+    parser = YandexXmlParser()
+    first_chunk = XML[:XML.index(b'<doc><url>https://a.ru/2')]
+    assert [doc['url'] for doc in parser.feed(first_chunk)] == ['https://a.ru/1']
+    assert [doc['url'] for doc in parser.feed(XML[len(first_chunk):])] == ['https://a.ru/2', 'https://b.ru/1']
+    assert parser.close() == []
+    assert len(parser.results) == 3
+
+
+def test_small_chunks_give_the_same_result() -> None:
+    parser = YandexXmlParser()
+    for i in range(0, len(XML), 7):
+        parser.feed(XML[i:i + 7])
+    parser.close()
+    assert parser.results == parse_yandex_xml(XML)
+
+
+def error_response(code: int) -> bytes:
+    return (f'<?xml version="1.0" encoding="utf-8"?><yandexsearch version="1.0"><response>'
+            f'<error code="{code}">Сообщение</error></response></yandexsearch>').encode()
+
+
+def test_search_errors_in_response_are_raised() -> None:
+    with pytest.raises(YandexSearchError) as error:
+        parse_yandex_xml(error_response(55))
+    assert error.value.code == '55' and is_transient_error(error.value)
+    with pytest.raises(YandexSearchError) as error:
+        parse_yandex_xml(error_response(42))
+    assert not is_transient_error(error.value)
+    assert parse_yandex_xml(error_response(15)) == []
@@ -0,0 +1,21 @@
+from typing import Iterator
+
+import pytest
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+from sqlmodel import Session, SQLModel, create_engine
+
+
+@pytest.fixture
+def sqlite_engine() -> Iterator[Engine]:
+    """База в памяти со всеми таблицами; доступна из потоков (asyncio.to_thread)."""
+    engine = create_engine('sqlite://', connect_args={'check_same_thread': False}, poolclass=StaticPool)
+    SQLModel.metadata.create_all(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def sqlite_session(sqlite_engine: Engine) -> Iterator[Session]:
+    with Session(sqlite_engine) as session:
+        yield session
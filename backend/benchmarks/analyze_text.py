@@ -0,0 +1,77 @@
+"""
+Стоимость analyze_text на запрос: прежний путь (лемматизация текста целиком,
+TfidfVectorizer с обучением на одном тексте, toarray и полная сортировка)
+против KeywordAnalyzer (счётчики словоформ, снимок индекса IDF, частичная
+сортировка). Оба варианта используют один и тот же прогретый кэш лемм.
+
+    python -m benchmarks.analyze_text --words 500 5000 50000 --vocabulary 50000
+"""
+import argparse
+import random
+import re
+import time
+
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from benchmarks.fakes import _words
+from app.core.config import russian_stop_words
+from app.service.idf_index import IdfIndex, keyword_terms
+from app.service.lemmatizer import lemmatizer
+from app.service.text_analysis import KeywordAnalyzer
+
+
+def legacy(text: str, top_n: int) -> list:
+    """Прежний analyze_text."""
+    lemmatized_text = lemmatizer.lemmatize(re.sub(r'\W+', ' ', text.lower()))
+    vectorizer = TfidfVectorizer(stop_words=russian_stop_words)
+    tfidf_matrix = vectorizer.fit_transform([lemmatized_text])
+    feature_names = vectorizer.get_feature_names_out()
+    tfidf_scores = tfidf_matrix.toarray().flatten()
+    sorted_words = sorted(zip(feature_names, tfidf_scores), key=lambda x: x[1], reverse=True)
+    return sorted_words[:top_n]
+
+
+def build_index(vocabulary: int, text: str) -> IdfIndex:
+    """Индекс с заданным числом лемм; леммы текста в нём тоже есть."""
+    rnd = random.Random(1)
+    index = IdfIndex(reload_seconds=0)
+    index.documents = 10000
+    index._frequencies = {f'лемма{i}': rnd.randint(1, 10000) for i in range(vocabulary)}
+    lemmas = lemmatizer.lemmas(re.findall(r'\w+', text.lower()))
+    index._frequencies.update((term, rnd.randint(1, 10000)) for term in keyword_terms(' '.join(lemmas.values())))
+    index.version = 1
+    return index
+
+
+def measure(fn, repeat: int) -> float:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - started) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Подбор ключевых слов: TfidfVectorizer против KeywordAnalyzer')
+    parser.add_argument('--words', type=int, nargs='+', default=[500, 5000, 50000])
+    parser.add_argument('--vocabulary', type=int, default=50000, help='лемм в индексе IDF')
+    parser.add_argument('--top-n', type=int, default=10)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    for words in args.words:
+        rnd = random.Random(words)
+        # Предложения с заглавной буквой и знаками препинания, как в настоящей статье
+        text = ' '.join(f'{_words(f"{words}-{i}", 10).capitalize()}{rnd.choice(".,!?")}'
+                        for i in range(words // 10))
+        analyzer = KeywordAnalyzer(build_index(args.vocabulary, text))  # заодно прогревает кэш лемм
+        started = time.perf_counter()
+        analyzer.prepare()
+        prepare = time.perf_counter() - started
+        before = measure(lambda: legacy(text, args.top_n), args.repeat)
+        after = measure(lambda: analyzer.analyze([text], args.top_n), args.repeat)
+        print(f'{words:>7} слов   tfidf {before * 1000:8.2f} мс   engine {after * 1000:8.2f} мс   '
+              f'x{before / after:5.1f}   (снимок индекса один раз: {prepare * 1000:.1f} мс)')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,171 @@
+"""
+Локальные заглушки внешних сервисов для нагрузочного тестирования.
+
+Один процесс обслуживает:
+  * /search/xml           — Yandex XML Search;
+  * /pages/{page_id}      — страницы-источники (с ETag и ответом 304);
+  * /v1/chat/completions  — OpenAI-совместимый чат (обычный и потоковый ответ).
+
+Запуск:
+    python -m benchmarks.fakes --port 9000 --latency 0.2 --error-rate 0.01
+
+Приложение направляется на заглушки переменными окружения:
+    YANDEX_SEARCH_URL=http://localhost:9000/search/xml
+    LLM_BASE_URL=http://localhost:9000/v1
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+from dataclasses import dataclass
+from xml.sax.saxutils import escape
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_WORDS = (
+    'python асинхронный сервер запрос ответ данные модель статья поиск кэш '
+    'производительность задержка поток очередь воркер база индекс текст '
+    'контент оптимизация пользователь система архитектура сеть пакет '
+    # стоп-слова нужны, чтобы эвристики newspaper3k признали текст статьёй
+    'и в на для что это как по с не'
+).split()
+
+
+@dataclass
+class FakeConfig:
+    base_url: str = 'http://localhost:9000'
+    latency: float = 0.1  # базовая задержка ответа, секунды
+    jitter: float = 0.05  # случайная добавка к задержке, секунды
+    error_rate: float = 0.0  # доля ответов с ошибкой
+    error_status: int = 500
+    groups: int = 5  # групп в поисковой выдаче, если не задано в запросе
+    docs_in_group: int = 3
+    page_kb: int = 50  # размер HTML-страницы
+    llm_latency: float = 1.0  # время до первого токена
+    llm_tokens: int = 500  # число токенов в ответе модели
+    token_delay: float = 0.005  # пауза между токенами при потоковой выдаче
+
+
+def _words(seed: str, count: int) -> str:
+    rnd = random.Random(seed)
+    return ' '.join(rnd.choice(_WORDS) for _ in range(count))
+
+
+def create_app(config: FakeConfig) -> FastAPI:
+    app = FastAPI(title='fakes')
+
+    async def delay(base: float) -> None:
+        await asyncio.sleep(base + random.uniform(0, config.jitter))
+
+    def failed() -> bool:
+        return random.random() < config.error_rate
+
+    @app.get('/search/xml')
+    async def search_xml(query: str = '', page: int = 0, groupby: str = '') -> Response:
+        await delay(config.latency)
+        if failed():
+            return Response(status_code=config.error_status)
+        groups = re.search(r'groups-on-page=(\d+)', groupby)
+        docs = re.search(r'docs-in-group=(\d+)', groupby)
+        groups = int(groups.group(1)) if groups else config.groups
+        docs = int(docs.group(1)) if docs else config.docs_in_group
+        seed = hashlib.md5(f'{query}:{page}'.encode()).hexdigest()[:8]
+
+        items = []
+        for group in range(groups):
+            group_docs = []
+            for doc in range(docs):
+                page_id = f'{seed}-{group}-{doc}'
+                group_docs.append(
+                    f'<doc><url>{config.base_url}/pages/{page_id}</url>'
+                    f'<title>{escape(_words(page_id, 6))}</title>'
+                    f'<passages><passage>{escape(_words(page_id + "a", 25))}</passage>'
+                    f'<passage>{escape(_words(page_id + "b", 25))}</passage></passages></doc>'
+                )
+            items.append(f'<group>{"".join(group_docs)}</group>')
+        body = (
+            '<?xml version="1.0" encoding="utf-8"?><yandexsearch version="1.0"><response>'
+            f'<results><grouping>{"".join(items)}</grouping></results></response></yandexsearch>'
+        )
+        return Response(content=body, media_type='application/xml')
+
+    @app.get('/pages/{page_id}')
+    async def page(page_id: str, request: Request) -> Response:
+        await delay(config.latency)
+        if failed():
+            return Response(status_code=config.error_status)
+        etag = f'"{page_id}"'
+        if request.headers.get('if-none-match') == etag:
+            return Response(status_code=304, headers={'ETag': etag})
+        paragraph_words = 60
+        paragraphs = max(1, config.page_kb * 1024 // (paragraph_words * 10))
+        body = ''.join(
+            f'<p>{_words(f"{page_id}-{i}", paragraph_words)}.</p>' for i in range(paragraphs)
+        )
+        html = (
+            f'<html lang="ru"><head><title>{page_id}</title></head><body>'
+            f'<nav>Главная | Новости | Контакты</nav><article>{body}</article>'
+            '<footer>© 2024</footer></body></html>'
+        )
+        return Response(content=html, media_type='text/html', headers={'ETag': etag})
+
+    @app.post('/v1/chat/completions')
+    async def chat_completions(request: Request) -> Response:
+        payload = await request.json()
+        await delay(config.llm_latency)
+        if failed():
+            return JSONResponse({'error': {'message': 'fake upstream error'}},
+                                status_code=config.error_status)
+        tokens = min(config.llm_tokens, payload.get('max_tokens') or config.llm_tokens)
+        prompt_tokens = sum(len(str(m.get('content', ''))) // 3 for m in payload.get('messages', []))
+        words = _words(str(time.time()), tokens).split()
+        model = payload.get('model', 'fake')
+
+        if not payload.get('stream'):
+            return JSONResponse({
+                'id': 'fake', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+                'choices': [{'index': 0, 'finish_reason': 'stop',
+                             'message': {'role': 'assistant', 'content': ' '.join(words)}}],
+                'usage': {'prompt_tokens': prompt_tokens, 'completion_tokens': tokens,
+                          'total_tokens': prompt_tokens + tokens},
+            })
+
+        async def stream():
+            for word in words:
+                chunk = {
+                    'id': 'fake', 'object': 'chat.completion.chunk', 'created': int(time.time()),
+                    'model': model,
+                    'choices': [{'index': 0, 'delta': {'content': word + ' '}, 'finish_reason': None}],
+                }
+                yield f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'
+                await asyncio.sleep(config.token_delay)
+            yield 'data: [DONE]\n\n'
+
+        return StreamingResponse(stream(), media_type='text/event-stream')
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Заглушки Yandex XML, страниц и LLM')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--public-url', default=None,
+                        help='адрес заглушек, который попадёт в URL страниц выдачи')
+    for name, value in vars(FakeConfig()).items():
+        if name != 'base_url':
+            parser.add_argument(f'--{name.replace("_", "-")}', type=type(value), default=value)
+    args = parser.parse_args()
+
+    options = {name: getattr(args, name) for name in vars(FakeConfig()) if name != 'base_url'}
+    config = FakeConfig(base_url=args.public_url or f'http://localhost:{args.port}', **options)
+    uvicorn.run(create_app(config), host=args.host, port=args.port, log_level='warning')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""
+Нагрузочный тест API: конкурентные авторизованные пользователи.
+
+Перед запуском поднимите приложение, направленное на заглушки из
+benchmarks.fakes, и укажите данные суперпользователя (по умолчанию берутся
+из FIRST_SUPERUSER / FIRST_SUPERUSER_PASSWORD):
+
+    python -m benchmarks.load --base-url http://localhost:8888/v1 \\
+        --users 20 --duration 60 --scenario generate=1,stream=1,analyze=2,articles=4
+
+Отчёт (пропускная способность, p50/p95/p99 по каждому эндпоинту)
+печатается и сохраняется в benchmarks/results/<время>_<метка>.json;
+с --compare можно сравнить с предыдущим прогоном.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import subprocess
+import time
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+
+import httpx
+
+RESULTS_DIR = Path(__file__).parent / 'results'
+THEMES = ['Асинхронный Python', 'Кэширование в веб-сервисах', 'Очереди задач',
+          'Оптимизация SQL-запросов', 'Потоковая передача данных']
+ANALYZE_TEXT = ('Асинхронные веб-сервисы на Python обрабатывают тысячи запросов, '
+                'если тяжёлые операции не блокируют цикл событий. ') * 200
+
+
+@dataclass
+class User:
+    email: str
+    password: str
+    headers: dict
+    avatar_id: str
+
+
+async def _login(client: httpx.AsyncClient, email: str, password: str) -> dict:
+    response = await client.post('/login/access-token', data={'username': email, 'password': password})
+    response.raise_for_status()
+    return {'Authorization': f"Bearer {response.json()['access_token']}"}
+
+
+async def _create_user(client: httpx.AsyncClient, admin: dict) -> User:
+    email = f'load-{uuid.uuid4().hex[:12]}@example.com'
+    password = uuid.uuid4().hex
+    response = await client.post('/users/', headers=admin, json={'email': email, 'password': password})
+    response.raise_for_status()
+    headers = await _login(client, email, password)
+    response = await client.post('/avatars/personal', headers=headers, json={
+        'name': 'Нагрузка', 'description': 'Автор технических статей',
+        'key_words': 'python, производительность', 'domain': 'разработка', 'tone': 'деловом',
+    })
+    response.raise_for_status()
+    return User(email, password, headers, response.json()['id'])
+
+
+def _generate_params(user: User, args: argparse.Namespace) -> dict:
+    return {'avatar_id': user.avatar_id, 'model': args.model, 'theme': random.choice(THEMES),
+            'key_words': 'python, производительность', 'len_article': args.len_article}
+
+
+async def _generate(client, user, args):
+    return await client.get('/article/generate', headers=user.headers, params=_generate_params(user, args))
+
+
+async def _stream(client, user, args):
+    async with client.stream('GET', '/article/generate/stream', headers=user.headers,
+                             params=_generate_params(user, args)) as response:
+        async for _ in response.aiter_bytes():
+            pass
+    return response
+
+
+async def _analyze(client, user, args):
+    return await client.post('/article/analyze_text', headers=user.headers,
+                             json={'article_text': ANALYZE_TEXT, 'top_n': 10})
+
+
+async def _articles(client, user, args):
+    return await client.get('/article/', headers=user.headers)
+
+
+async def _me(client, user, args):
+    return await client.get('/users/me', headers=user.headers)
+
+
+async def _login_scenario(client, user, args):
+    return await client.post('/login/access-token',
+                             data={'username': user.email, 'password': user.password})
+
+
+SCENARIOS = {
+    'generate': _generate,
+    'stream': _stream,
+    'analyze': _analyze,
+    'articles': _articles,
+    'me': _me,
+    'login': _login_scenario,
+}
+
+
+def _percentile(values: list[float], q: float) -> float:
+    """Процентиль методом ближайшего ранга."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(0, math.ceil(q / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def _summary(latencies: list[float], errors: int, elapsed: float) -> dict:
+    return {
+        'count': len(latencies),
+        'errors': errors,
+        'throughput': round(len(latencies) / elapsed, 3) if elapsed else 0.0,
+        'mean': round(sum(latencies) / len(latencies), 4) if latencies else 0.0,
+        'p50': round(_percentile(latencies, 50), 4),
+        'p95': round(_percentile(latencies, 95), 4),
+        'p99': round(_percentile(latencies, 99), 4),
+        'max': round(max(latencies), 4) if latencies else 0.0,
+    }
+
+
+async def _user_loop(client, user, args, weights, deadline, latencies, errors) -> None:
+    names, values = zip(*weights.items())
+    done = 0
+    while time.monotonic() < deadline and (not args.requests or done < args.requests):
+        name = random.choices(names, values)[0]
+        started = time.perf_counter()
+        try:
+            response = await SCENARIOS[name](client, user, args)
+            ok = response.status_code < 400
+        except httpx.HTTPError:
+            ok = False
+        latencies[name].append(time.perf_counter() - started)
+        if not ok:
+            errors[name] += 1
+        done += 1
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'],
+                                       cwd=Path(__file__).parent, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ''
+
+
+async def run(args: argparse.Namespace) -> dict:
+    weights = {}
+    for item in args.scenario.split(','):
+        name, _, weight = item.partition('=')
+        if name not in SCENARIOS:
+            raise SystemExit(f'Неизвестный сценарий: {name}')
+        weights[name] = float(weight or 1)
+
+    limits = httpx.Limits(max_connections=args.users * 2, max_keepalive_connections=args.users * 2)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        admin = await _login(client, args.admin_email, args.admin_password)
+        users = await asyncio.gather(*(_create_user(client, admin) for _ in range(args.users)))
+
+        latencies: dict[str, list[float]] = defaultdict(list)
+        errors: dict[str, int] = defaultdict(int)
+        started = time.monotonic()
+        await asyncio.gather(*(
+            _user_loop(client, user, args, weights, started + args.duration, latencies, errors)
+            for user in users
+        ))
+        elapsed = time.monotonic() - started
+
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        'label': args.label,
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'git_commit': _git_commit(),
+        'config': {'users': args.users, 'duration': args.duration, 'requests': args.requests,
+                   'scenario': weights, 'model': args.model, 'len_article': args.len_article,
+                   'base_url': args.base_url},
+        'elapsed': round(elapsed, 3),
+        'endpoints': {name: _summary(values, errors[name], elapsed)
+                      for name, values in sorted(latencies.items())},
+        'total': _summary(all_latencies, sum(errors.values()), elapsed),
+    }
+
+
+def _print_report(report: dict, baseline: dict | None = None) -> None:
+    header = f"{'endpoint':<10} {'count':>7} {'err':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8}"
+    print(header)
+    print('-' * len(header))
+    rows = {**report['endpoints'], 'TOTAL': report['total']}
+    for name, stats in rows.items():
+        line = (f"{name:<10} {stats['count']:>7} {stats['errors']:>5} {stats['throughput']:>8.2f} "
+                f"{stats['p50']:>8.3f} {stats['p95']:>8.3f} {stats['p99']:>8.3f}")
+        if baseline:
+            base = baseline['endpoints'].get(name) if name != 'TOTAL' else baseline['total']
+            if base and base['p95']:
+                line += f"   p95 {100 * (stats['p95'] - base['p95']) / base['p95']:+.1f}%"
+        print(line)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Нагрузочный тест API генерации статей')
+    parser.add_argument('--base-url', default='http://localhost:8888/v1')
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--duration', type=float, default=60.0, help='секунд на прогон')
+    parser.add_argument('--requests', type=int, default=0, help='лимит запросов на пользователя (0 — без лимита)')
+    parser.add_argument('--scenario', default='generate=1,analyze=2,articles=4,me=2,login=1')
+    parser.add_argument('--model', default='gpt-4-turbo')
+    parser.add_argument('--len-article', type=int, default=4096)
+    parser.add_argument('--timeout', type=float, default=600.0)
+    parser.add_argument('--admin-email', default=os.getenv('FIRST_SUPERUSER'))
+    parser.add_argument('--admin-password', default=os.getenv('FIRST_SUPERUSER_PASSWORD'))
+    parser.add_argument('--label', default='run')
+    parser.add_argument('--output', type=Path, default=None, help='файл отчёта (по умолчанию в benchmarks/results/)')
+    parser.add_argument('--compare', type=Path, default=None, help='отчёт предыдущего прогона для сравнения')
+    args = parser.parse_args()
+    if not args.admin_email or not args.admin_password:
+        raise SystemExit('Укажите --admin-email/--admin-password или FIRST_SUPERUSER/FIRST_SUPERUSER_PASSWORD')
+
+    report = asyncio.run(run(args))
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    _print_report(report, baseline)
+
+    output = args.output or RESULTS_DIR / f"{datetime.now():%Y%m%d-%H%M%S}_{args.label}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2))
+    print(f'Отчёт сохранён: {output}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""
+Холодный старт и память воркеров: ленивая загрузка тяжёлых зависимостей
+против предзагрузки (PRELOAD_MODELS) и pre-fork с общими страницами.
+
+* cold — время импорта app.main, RSS после импорта, время и RSS после
+  первого анализа текста и извлечения страницы (догрузка словарей);
+* fork — мастер импортирует приложение (с предзагрузкой или без) и
+  порождает воркеры, как gunicorn с preload_app; каждый воркер прогревается,
+  после чего для него снимаются RSS и PSS (доля общих страниц делится между
+  процессами, поэтому PSS показывает выигрыш от copy-on-write).
+
+Запускать в окружении приложения (переменные .env), только Linux (/proc):
+
+    python -m benchmarks.startup --repeat 3 --workers 4
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_COLD = '''
+import json, time
+started = time.perf_counter()
+import app.main
+imported = time.perf_counter()
+from benchmarks.startup import rss_kb, warm_up
+rss_import = rss_kb()
+warm_up()
+print(json.dumps({"import": imported - started, "first_use": time.perf_counter() - imported,
+                  "rss_import": rss_import, "rss_warm": rss_kb()}))
+'''
+
+_FORK = '''
+import gc, json, os, sys
+import app.main
+from app.core.config import settings
+from benchmarks.startup import memory_kb, warm_up
+if settings.PRELOAD_MODELS:
+    gc.freeze()
+workers = int(sys.argv[1])
+ready_r, ready_w = os.pipe()
+release_r, release_w = os.pipe()
+pids = []
+for _ in range(workers):
+    pid = os.fork()
+    if pid == 0:
+        warm_up()
+        os.write(ready_w, b'1')
+        os.read(release_r, 1)
+        os._exit(0)
+    pids.append(pid)
+for _ in pids:
+    os.read(ready_r, 1)
+result = {"workers": [memory_kb(pid) for pid in pids], "master": memory_kb(os.getpid())}
+os.write(release_w, b'1' * len(pids))
+for pid in pids:
+    os.waitpid(pid, 0)
+print(json.dumps(result))
+'''
+
+_HTML = ('<html lang="ru"><head><title>Проверка</title></head><body><article>'
+         + '<p>Асинхронные функции в Python позволяют обрабатывать много запросов одновременно.</p>' * 20
+         + '</article></body></html>').encode()
+
+
+def rss_kb() -> int:
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmRSS:'):
+                return int(line.split()[1])
+    return 0
+
+
+def memory_kb(pid: int) -> dict:
+    """RSS и PSS процесса в КБ."""
+    memory = {}
+    with open(f'/proc/{pid}/smaps_rollup') as rollup:
+        for line in rollup:
+            name, _, value = line.partition(':')
+            if name in ('Rss', 'Pss'):
+                memory[name.lower()] = int(value.split()[0])
+    return memory
+
+
+def warm_up() -> None:
+    """Первое использование тяжёлых зависимостей: анализ текста и извлечение страницы."""
+    from app.service.extractor import extract_text
+    from app.service.text_analysis import keyword_analyzer
+    keyword_analyzer.analyze(['Асинхронные функции позволяют обрабатывать запросы одновременно'], 10)
+    extract_text(_HTML, 'https://example.com/article')
+
+
+def run(code: str, preload: bool, *args: str) -> dict:
+    env = dict(os.environ, PRELOAD_MODELS=str(preload).lower())
+    output = subprocess.run([sys.executable, '-c', code, *args], env=env, check=True,
+                            capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Холодный старт и память воркеров')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--workers', type=int, default=4)
+    args = parser.parse_args()
+
+    print('холодный старт (медиана):')
+    for preload in (False, True):
+        runs = [run(_COLD, preload) for _ in range(args.repeat)]
+        median = {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+        print(f'  {"preload" if preload else "lazy":<8} импорт {median["import"]:5.2f} с  '
+              f'RSS {median["rss_import"] / 1024:6.0f} МБ   первый анализ {median["first_use"]:5.2f} с  '
+              f'RSS {median["rss_warm"] / 1024:6.0f} МБ')
+
+    print(f'fork, {args.workers} воркеров после прогрева:')
+    for preload in (False, True):
+        result = run(_FORK, preload, str(args.workers))
+        workers = result['workers']
+        rss = statistics.mean(w['rss'] for w in workers) / 1024
+        pss = statistics.mean(w['pss'] for w in workers) / 1024
+        total = (sum(w['pss'] for w in workers) + result['master']['pss']) / 1024
+        print(f'  {"preload" if preload else "lazy":<8} на воркер RSS {rss:6.0f} МБ  PSS {pss:6.0f} МБ   '
+              f'всего PSS с мастером {total:6.0f} МБ')
+
+
+if __name__ == '__main__':
+    main()
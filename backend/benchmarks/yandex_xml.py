@@ -0,0 +1,84 @@
+"""
+Сравнение разбора ответа Yandex XML: дерево целиком (ET.fromstring + findall)
+против потокового YandexXmlParser. Печатает время и пик памяти.
+
+    python -m benchmarks.yandex_xml --groups 100 --docs 3
+"""
+import argparse
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from benchmarks.fakes import _words
+from app.service.yandex_xml import YandexXmlParser
+
+CHUNK = 16 * 1024
+
+
+def build_response(groups: int, docs: int) -> bytes:
+    items = []
+    for group in range(groups):
+        group_docs = ''.join(
+            f'<doc><url>https://example.com/{group}/{doc}</url>'
+            f'<title>{_words(f"{group}-{doc}", 6)} <hlword>python</hlword></title>'
+            f'<passages><passage>{_words(f"{group}-{doc}a", 25)}</passage>'
+            f'<passage>{_words(f"{group}-{doc}b", 25)}</passage></passages></doc>'
+            for doc in range(docs)
+        )
+        items.append(f'<group>{group_docs}</group>')
+    return (
+        '<?xml version="1.0" encoding="utf-8"?><yandexsearch version="1.0"><response>'
+        f'<results><grouping>{"".join(items)}</grouping></results></response></yandexsearch>'
+    ).encode()
+
+
+def parse_tree(data: bytes) -> list[dict]:
+    """Прежний способ: дерево целиком и поиск по потомкам."""
+    root = ET.fromstring(data)
+    results = []
+    for group in root.findall('.//group'):
+        for doc in group.findall('.//doc'):
+            results.append({
+                'url': doc.find('.//url').text,
+                'title': doc.find('.//title').text,
+                'passages': [p.text for p in doc.findall('.//passage')],
+            })
+    return results
+
+
+def parse_stream(data: bytes) -> list[dict]:
+    parser = YandexXmlParser()
+    for i in range(0, len(data), CHUNK):
+        parser.feed(data[i:i + CHUNK])
+    parser.close()
+    return parser.results
+
+
+def measure(fn, data: bytes, repeat: int) -> tuple[float, int]:
+    started = time.perf_counter()
+    for _ in range(repeat):
+        fn(data)
+    elapsed = (time.perf_counter() - started) / repeat
+    tracemalloc.start()
+    fn(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Разбор ответа Yandex XML: дерево против потока')
+    parser.add_argument('--groups', type=int, default=100)
+    parser.add_argument('--docs', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    data = build_response(args.groups, args.docs)
+    print(f'ответ: {len(data) / 1024:.0f} КБ, документов: {args.groups * args.docs}')
+    for name, fn in (('tree', parse_tree), ('stream', parse_stream)):
+        elapsed, peak = measure(fn, data, args.repeat)
+        print(f'{name:<7} {elapsed * 1000:8.2f} мс   пик памяти {peak / 1024:8.0f} КБ')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,37 @@
+# Режим pre-fork: приложение и словари морфологии загружаются один раз в мастер-процессе,
+# воркеры получают их через fork и делят страницы памяти (copy-on-write).
+#   gunicorn app.main:app -c gunicorn.conf.py
+# Число воркеров — WEB_CONCURRENCY (по умолчанию 1), адрес — BIND.
+import gc
+import os
+import shutil
+
+os.environ.setdefault('PRELOAD_MODELS', 'true')
+# Метрики Prometheus всех воркеров собираются через общий каталог (multiprocess-режим
+# prometheus_client); переменная должна быть задана до импорта приложения, а каталог —
+# очищен от файлов прошлого запуска
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/prometheus-multiproc')
+shutil.rmtree(metrics_dir, ignore_errors=True)
+os.makedirs(metrics_dir, exist_ok=True)
+
+bind = os.environ.get('BIND', '0.0.0.0:8888')
+worker_class = 'uvicorn.workers.UvicornWorker'
+preload_app = True
+
+
+def pre_fork(server, worker):
+    # Объекты мастера уходят из-под сборщика мусора: он не трогает их заголовки
+    # в воркерах, и страницы с загруженными словарями остаются общими
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    # Соединения из пула мастера не должны использоваться в воркерах
+    from app.core.db import engine
+    engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    # Gauge завершившегося воркера больше не учитываются, счётчики остаются в сумме
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
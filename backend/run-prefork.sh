@@ -0,0 +1,8 @@
+#!/bin/sh
+set -e
+
+# Применение миграций при запуске контейнера
+alembic upgrade head
+
+# Запуск gunicorn с воркерами uvicorn: словари загружаются один раз до fork
+exec gunicorn app.main:app -c gunicorn.conf.py